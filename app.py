@@ -1,12 +1,1250 @@
-import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import os
+import io
+import json
+import hashlib
+import re
+import threading
+import pickle
+import time
+import uuid
+import contextvars
+import functools
+import multiprocessing
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from html import escape
+from pandas.api.types import union_categoricals
+
+try:
+    import pyarrow.feather as feather
+except ImportError:  # pyarrow 가 없으면 디스크 캐시 없이 매번 파싱한다
+    feather = None
+
+# -----------------------------------------------------------------------------
+# 0. 데이터 스키마 및 수집 (crawllog.csv -> 타입이 지정된 DataFrame)
+# -----------------------------------------------------------------------------
+# 대시보드가 실제로 쓰는 컬럼만 읽는다. 숫자 컬럼도 일단 category로 읽어서
+# 고유값 단위로만 변환한다 (xl/lvl/mhp/tdam 은 고유값이 수백 개 수준).
+CATEGORY_COLUMNS = ['race', 'cls', 'god', 'killer', 'ktyp', 'tmsg', 'place']
+NUMERIC_COLUMNS = ['lvl', 'xl', 'tdam', 'mhp']
+CSV_SCHEMA = {c: 'category' for c in CATEGORY_COLUMNS + NUMERIC_COLUMNS}
+
+# 여러 서버 로그를 합칠 때 같은 판을 알아보는 키. 있으면 읽어서 game_key 해시로 줄이고 name/start 는 버린다.
+KEY_COLUMNS = ['name', 'start', 'v']
+
+# 기간 필터용 종료 시각. 버전 필터는 KEY_COLUMNS 의 v 를 같이 쓴다.
+FILTER_COLUMNS = ['end']
+
+# 판마다 거의 다른 값이라 category 로 읽으면 사전만 커지고 느려지는 컬럼 (v 처럼 고유값이 적은 것만 category)
+STRING_COLUMNS = ['name', 'start', 'end']
+
+# 사망 기록에서 제외할 killer 값 (승리, 종료, 자살성 종료 등)
+NON_DEATH_KILLERS = ['winning', 'quit', 'user', 'leaving', 'wizmode', 'starvation', 'Unknown', 'miscast']
+
+
+def _expand(s, values, fill):
+    # 카테고리별로 계산한 값을 코드로 행 단위로 펼친다 (코드 -1 = 결측 -> fill)
+    return np.append(np.asarray(values), fill)[s.cat.codes.to_numpy()]
+
+
+def _recategorize(s, labels):
+    # 카테고리마다 새 라벨을 붙이고 코드만 다시 매핑한다 (행 단위 파이썬 루프 없음)
+    labels = pd.Index(labels)
+    new_cats = labels.dropna().unique()
+    remap = np.append(new_cats.get_indexer(labels), -1)
+    codes = remap[s.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codes, categories=new_cats), index=s.index)
+
+
+def _fill_category(s, value):
+    if value not in s.cat.categories:
+        s = s.cat.add_categories([value])
+    return s.fillna(value)
+
+
+def _format_places(place, lvl):
+    # 'D' + lvl -> 'D:lvl', 나머지는 그대로 (format_place 의 벡터화 버전)
+    cats = place.cat.categories.astype(str)
+    codes = place.cat.codes.to_numpy().astype(np.int32)
+    is_d = (place == 'D').to_numpy() & ~np.isnan(lvl)
+    d_lvls = np.unique(lvl[is_d].astype(int))
+    new_cats = pd.Index(list(cats) + [f"D:{i}" for i in d_lvls]).unique()
+    d_pos = new_cats.get_indexer([f"D:{i}" for i in d_lvls])
+    codes[is_d] = d_pos[np.searchsorted(d_lvls, lvl[is_d].astype(int))]
+    fp = pd.Categorical.from_codes(codes, categories=new_cats).remove_unused_categories()
+    return pd.Series(fp, index=place.index)
+
+
+def _compact_int(values):
+    # 실수 배열(NaN = 결측)을 값 범위에 맞는 가장 작은 nullable 정수형(Int8/Int16/...)으로 줄인다
+    finite = values[~np.isnan(values)]
+    if len(finite) and not np.array_equal(finite, np.round(finite)):
+        return values.astype(np.float32)
+    lo, hi = (finite.min(), finite.max()) if len(finite) else (0, 0)
+    dtype = next(t for t in ('int8', 'int16', 'int32', 'int64') if np.iinfo(t).min <= lo and hi <= np.iinfo(t).max)
+    return pd.array(values, dtype=dtype.capitalize())
+
+
+def _end_times(text):
+    # 문자열 Series -> datetime64[s] 배열 (결측이나 알 수 없는 형식은 NaT)
+    # DCSS 의 'YYYYMMDDhhmmss[SD]' 는 월이 0부터 시작한다 (1월 = 00). 그 외 형식은 to_datetime 에 맡긴다.
+    text = text.reset_index(drop=True)
+    dcss = text.str.fullmatch(r'\d{14}[SD]?').fillna(False).to_numpy(dtype=bool)
+    digits = pd.to_numeric(text.str.slice(0, 14).where(dcss), errors='coerce')
+    parts = {'year': digits // 1e10, 'month': digits // 1e8 % 100 + 1, 'day': digits // 1e6 % 100,
+             'hour': digits // 1e4 % 100, 'minute': digits // 100 % 100, 'second': digits % 100}
+    times = pd.to_datetime(pd.DataFrame(parts), errors='coerce')
+    other = ~dcss & text.notna().to_numpy()
+    if other.any():
+        times[other] = pd.to_datetime(text[other], errors='coerce', format='mixed', utc=True).dt.tz_localize(None)
+    return times.to_numpy(dtype='datetime64[s]')
+
+
+def _parse_end_times(s):
+    # logfile 파서는 모든 컬럼을 category 로 주므로 고유값 단위로, CSV 는 (STRING_COLUMNS) 값 그대로 변환한다
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        return _expand(s, _end_times(pd.Series(s.cat.categories.astype(str))), np.datetime64('NaT', 's'))
+    return _end_times(s)
+
+
+def derive_columns(df):
+    # 숫자 컬럼: 고유값만 변환하고, 값이 있는데 숫자가 아닌 행은 파싱 실패로 센다
+    bad = np.zeros(len(df), dtype=bool)
+    nums = {}
+    for c in NUMERIC_COLUMNS:
+        s = df[c]
+        vals = pd.to_numeric(s.cat.categories.astype(str), errors='coerce')
+        nums[c] = _expand(s, vals, np.nan).astype(float)
+        bad |= (s.cat.codes.to_numpy() >= 0) & np.isnan(nums[c])
+        df[c] = _compact_int(nums[c])
+    bad |= df['race'].isna().to_numpy() | df['cls'].isna().to_numpy()
+
+    df['god'] = _fill_category(df['god'], 'No God')
+    df['killer'] = _fill_category(df['killer'], 'Unknown')
+
+    tmsg_cats = df['tmsg'].cat.categories.astype(str)
+    escaped = _expand(df['tmsg'], tmsg_cats.str.lower().str.contains('escaped', regex=False), False)
+    df['is_win'] = (df['ktyp'] == 'winning').to_numpy() | escaped.astype(bool)
+
+    race_cats = df['race'].cat.categories.astype(str)
+    df['race_grouped'] = _recategorize(df['race'], np.where(race_cats.str.contains('Draconian'), 'Draconian', race_cats))
+    df['formatted_place'] = _format_places(df['place'], nums['lvl'])
+    df['is_death'] = ~df['killer'].isin(NON_DEATH_KILLERS).to_numpy()
+
+    # 키가 하나라도 빠진 행은 game_key = 0 (중복 제거 대상에서 제외)
+    if all(c in df.columns for c in KEY_COLUMNS):
+        key = pd.util.hash_pandas_object(df[KEY_COLUMNS], index=False).to_numpy()
+        key = np.where(df[KEY_COLUMNS].isna().any(axis=1).to_numpy(), np.uint64(0), key)
+    else:
+        key = np.zeros(len(df), dtype=np.uint64)
+    df['game_key'] = key
+    if 'v' not in df.columns:
+        df['v'] = pd.Categorical([None] * len(df), categories=pd.Index([], dtype=str))
+    if 'end' in df.columns:
+        df['end'] = _parse_end_times(df['end'])
+    else:
+        df['end'] = np.full(len(df), np.datetime64('NaT', 's'))
+    # tmsg 는 is_win 판정에만 쓰이고 고유값이 많아서 여기서 버린다
+    df = df.drop(columns=[c for c in ('name', 'start', 'tmsg') if c in df.columns])
+    return df, int(bad.sum())
+
+
+def is_logfile(path):
+    # .csv 가 아니면 서버가 남기는 DCSS 원본 logfile 로 본다
+    return not path.lower().endswith('.csv')
+
+
+def _csv_read_args(columns):
+    # 헤더의 컬럼 목록 -> read_csv 의 usecols/dtype (필수 컬럼이 없으면 KeyError)
+    missing = [c for c in CSV_SCHEMA if c not in columns]
+    if missing:
+        raise KeyError(f"필수 컬럼 없음: {', '.join(missing)}")
+    usecols = list(CSV_SCHEMA) + [c for c in KEY_COLUMNS + FILTER_COLUMNS if c in columns]
+    extra = {c: str if c in STRING_COLUMNS else 'category' for c in KEY_COLUMNS + FILTER_COLUMNS}
+    return {'usecols': usecols, 'dtype': CSV_SCHEMA | extra}
+
+
+def _read_csv_range(path, start, end, args):
+    # 헤더 줄을 앞에 다시 붙여 읽는다 (컬럼이 모자란 줄만 있는 꼬리도 처음 읽을 때처럼 빈 값으로 채워진다)
+    with open(path, 'rb') as f:
+        header = f.readline()
+        f.seek(start)
+        buf = io.BytesIO(header + f.read(end - start))
+    return pd.read_csv(buf, **args)
+
+
+def read_crawllog(path, start=0, end=None, columns=None):
+    # [start, end) 바이트 구간을 파싱한다. start > 0 이면 columns (처음 읽을 때의 헤더 컬럼 목록) 로 읽을 컬럼을 정한다.
+    # 반환: (df, report). report['bad_rows'] = 숫자 변환에 실패했거나 종족/직업이 비어 있는 행 수
+    size = os.path.getsize(path)
+    end = size if end is None else end
+    if is_logfile(path):
+        df = read_logfile(path, start, end)
+    else:
+        if start == 0:
+            columns = list(pd.read_csv(path, nrows=0).columns)
+        args = _csv_read_args(columns)
+        if start == 0:
+            df = pd.read_csv(path, **args)
+            if end < size and len(df):  # 아직 쓰는 중인 마지막 줄은 다음 번에 읽는다
+                df = df.iloc[:-1]
+        else:
+            df = _read_csv_range(path, start, end, args)
+    df, bad = derive_columns(df.reset_index(drop=True))
+    return df, {'rows': len(df), 'bad_rows': bad}
+
+
+def concat_rows(frames):
+    # 카테고리가 서로 다른 프레임들을 이어 붙인다 (pd.concat 은 카테고리가 다르면 object 로 풀어 버린다)
+    cols = {}
+    for c in frames[0].columns:
+        if isinstance(frames[0][c].dtype, pd.CategoricalDtype):
+            # 값이 전부 비어 있던 프레임은 카테고리 타입이 달라질 수 있어서 다른 프레임 쪽 타입에 맞춘다
+            parts = [f[c] for f in frames]
+            kinds = {p.cat.categories.dtype for p in parts if len(p.cat.categories)}
+            if len(kinds) == 1:
+                empty = pd.Index([], dtype=kinds.pop())
+                parts = [p if len(p.cat.categories) else p.cat.set_categories(empty) for p in parts]
+            cols[c] = union_categoricals(parts)
+        else:
+            cols[c] = pd.concat([f[c] for f in frames], ignore_index=True)  # Int8 + Int16 -> Int16
+    return pd.DataFrame(cols)
+
+
+# -----------------------------------------------------------------------------
+# 0-1. DCSS 원본 logfile 파서 (key=value 를 ':' 로 잇고, 값 안의 ':' 는 '::' 로 이스케이프)
+# -----------------------------------------------------------------------------
+# place 는 'D::5' 처럼 층까지 들어 있으므로 브랜치만 떼어 CSV 의 place 와 맞춘다 (층은 lvl)
+CRAWLLOG_PATHS = ['crawllog.csv', 'logfile']  # 앞에서부터 처음 있는 파일을 쓴다
+LOGFILE_KEYS = CATEGORY_COLUMNS + NUMERIC_COLUMNS + KEY_COLUMNS + FILTER_COLUMNS
+_LOGFILE_FIELD = re.compile(r'(?:^|:)(' + '|'.join(LOGFILE_KEYS) + r')=([^:]*)')
+LOGFILE_CHUNK_BYTES = 32 << 20
+
+
+def _parse_logfile_range(path, start, end):
+    # 워커 프로세스에서 도는 부분: [start, end) 의 줄들을 카테고리 컬럼 프레임으로 만든다
+    with open(path, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode('utf-8', errors='replace')
+    cols = {k: [] for k in LOGFILE_KEYS}
+    for line in text.splitlines():
+        if not line:
+            continue
+        fields = dict(_LOGFILE_FIELD.findall(line.replace('::', '\x00')))
+        for k in LOGFILE_KEYS:
+            cols[k].append(fields.get(k))
+    df = pd.DataFrame(cols, dtype='category')
+    for c in LOGFILE_KEYS:
+        cats = df[c].cat.categories.astype(str)
+        if c == 'place':
+            df[c] = _recategorize(df[c], cats.str.split('\x00').str[0])
+        elif cats.str.contains('\x00', regex=False).any():
+            df[c] = df[c].cat.rename_categories(cats.str.replace('\x00', ':', regex=False))
+    return df
+
+
+def _line_ranges(path, start, end, chunk):
+    # 대략 chunk 바이트마다 자르되, 경계는 항상 줄의 시작으로 맞춘다
+    bounds = [start]
+    with open(path, 'rb') as f:
+        pos = start + chunk
+        while pos < end:
+            f.seek(pos - 1)
+            f.readline()
+            pos = f.tell()
+            if pos >= end:
+                break
+            bounds.append(pos)
+            pos += chunk
+    bounds.append(end)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _process_pool(workers):
+    # fork 는 스레드가 도는 프로세스(스트림릿 서버, open_crawllog 의 로더 스레드)에서 다른 스레드가 쥔 락을 그대로 복사해
+    # 자식이 멈출 수 있으므로 forkserver(없으면 spawn) 로 띄운다. 자식은 이 모듈을 다시 import 해서 _parse_logfile_range 를 찾는다.
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+
+
+def read_logfile(path, start, end):
+    ranges = _line_ranges(path, start, end, LOGFILE_CHUNK_BYTES)
+    if len(ranges) == 1:
+        parts = [_parse_logfile_range(path, *ranges[0])]
+    else:
+        starts, ends = zip(*ranges)
+        with _process_pool(min(len(ranges), os.cpu_count() or 1)) as pool:
+            parts = list(pool.map(_parse_logfile_range, [path] * len(ranges), starts, ends))
+    return concat_rows(parts)
+
+
+# -----------------------------------------------------------------------------
+# 0-2. 디스크 캐시 (파생 컬럼까지 끝난 프레임을 Feather 로 저장, 재시작 시 memory-map)
+# -----------------------------------------------------------------------------
+CACHE_DIR = '.crawl_cache'
+CACHE_VERSION = 6  # 스키마나 파생 컬럼이 바뀌면 올려서 기존 캐시를 무효화한다
+DIGEST_SAMPLE = 1 << 20
+
+
+def _content_digest(path, size):
+    # 크기 + 앞/뒤 1MB 로 만든 내용 해시 (수 GB 파일이라도 바로 계산된다)
+    h = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, 'rb') as f:
+        h.update(f.read(min(size, DIGEST_SAMPLE)))
+        if size > DIGEST_SAMPLE:
+            f.seek(max(DIGEST_SAMPLE, size - DIGEST_SAMPLE))
+            h.update(f.read(size - f.tell()))
+    return h.hexdigest()
+
+
+def _cache_paths(path):
+    key = hashlib.blake2b(os.path.abspath(path).encode(), digest_size=4).hexdigest()
+    base = os.path.join(CACHE_DIR, f"{os.path.basename(path)}-{key}")
+    return base + '.feather', base + '.json'
+
+
+def _read_meta(meta_path):
+    try:
+        with open(meta_path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(meta_path, meta):
+    tmp = meta_path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp, meta_path)
+
+
+def _write_cache(data_path, meta_path, df, meta):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = data_path + '.tmp'
+    # 압축하지 않아야 다음 기동 때 memory-map 으로 바로 읽힌다
+    feather.write_feather(df, tmp, compression='uncompressed')
+    os.replace(tmp, data_path)
+    _write_meta(meta_path, meta)
+
+
+def _complete_end(path, size):
+    # 마지막 줄바꿈 바로 뒤의 위치. 커지는 중인 파일이면 그 뒤는 아직 쓰는 중인 줄이다.
+    with open(path, 'rb') as f:
+        pos = size
+        while pos > 0:
+            step = min(pos, 1 << 16)
+            f.seek(pos - step)
+            i = f.read(step).rfind(b'\n')
+            if i >= 0:
+                return pos - step + i + 1
+            pos -= step
+    return 0
+
+
+def source_change(path, meta):
+    # 'same' / 'grown' / 'rotated'. 이미 읽은 구간 [0, offset) 의 내용 해시가 달라지면 교체(로테이션)로 본다.
+    # 줄바꿈 없는 마지막 줄까지 읽어 둔 뒤(partial) 파일이 커졌다면 그 줄은 덜 쓰인 것이었으므로 역시 처음부터 다시 읽는다.
+    stat = os.stat(path)
+    if stat.st_size == meta['file_size'] and stat.st_mtime_ns == meta['mtime_ns']:
+        return 'same' if meta['offset'] >= stat.st_size else 'grown'  # 남겨 둔 마지막 줄: 파일이 멈췄으니 이번에 읽는다
+    if meta.get('partial') or stat.st_size < meta['offset'] or _content_digest(path, meta['offset']) != meta['digest']:
+        return 'rotated'
+    return 'grown'
+
+
+def _new_meta(path, stat):
+    # 아직 아무것도 읽지 않은 소스의 이어 읽기 meta (_advance_meta 로 읽은 구간만큼 늘린다)
+    return {'version': CACHE_VERSION, 'file_size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'offset': 0, 'rows': 0,
+            'columns': None if is_logfile(path) else list(pd.read_csv(path, nrows=0).columns),
+            'digest': None, 'report': {'rows': 0, 'bad_rows': 0}, 'partial': False}
+
+
+def _advance_meta(path, meta, end, report):
+    # [meta['offset'], end) 를 읽은 뒤의 meta. report 는 그 구간의 파싱 리포트
+    return meta | {'offset': end, 'rows': meta['rows'] + report['rows'], 'digest': _content_digest(path, end),
+                   'report': {k: meta['report'][k] + report[k] for k in report}, 'partial': _complete_end(path, end) < end}
+
+
+def _tail_end(path, meta):
+    # meta['offset'] 이후로 이번에 읽을 끝 위치. 반환: (end, stat 을 갱신한 meta)
+    # 지난번 stat 이후로 파일이 그대로면 줄바꿈 없는 마지막 줄까지 읽고, 아직 커지는 중이면 그 줄은 다음 번으로 남긴다.
+    stat = os.stat(path)
+    settled = stat.st_size == meta['file_size'] and stat.st_mtime_ns == meta['mtime_ns']
+    end = stat.st_size if settled else _complete_end(path, stat.st_size)
+    return end, meta | {'file_size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def read_tail(path, meta):
+    # meta['offset'] 이후를 파싱한다. 반환: (새 행 또는 None, 갱신된 meta)
+    end, meta = _tail_end(path, meta)
+    if end <= meta['offset']:
+        return None, meta
+    with span('parse_tail') as sp:
+        tail, report = read_crawllog(path, meta['offset'], end, meta['columns'])
+        sp['rows'] = len(tail)
+    return tail, _advance_meta(path, meta, end, report)
+
+
+def _save_cache(path, df, meta):
+    if feather is None:
+        return
+    data_path, meta_path = _cache_paths(path)
+    try:
+        if df is None:
+            _write_meta(meta_path, meta)
+        else:
+            with span('cache_write', len(df)):
+                _write_cache(data_path, meta_path, df, meta)
+    except OSError:
+        pass  # 읽기 전용 배포 환경이면 캐시 없이 진행
+
+
+def load_crawllog(path):
+    # 반환: (df, meta). meta 에는 이어 읽기용 오프셋/행 수/헤더와 파싱 리포트가 들어 있다.
+    # 캐시가 원본과 같으면 그대로, 원본 뒤에 줄이 붙었으면 꼬리만, 잘리거나 바뀌었으면 전체를 다시 읽는다.
+    data_path, meta_path = _cache_paths(path)
+    meta = _read_meta(meta_path)
+    change = None
+    if feather is not None and meta and meta.get('version') == CACHE_VERSION and os.path.exists(data_path):
+        change = source_change(path, meta)
+        if change != 'rotated':
+            with span('cache_read') as sp:
+                df = feather.read_table(data_path, memory_map=True).to_pandas()
+                sp['rows'] = len(df)
+            if change == 'grown':
+                tail, meta = read_tail(path, meta)
+                if tail is not None:
+                    df = concat_rows([df, tail])
+                _save_cache(path, None if tail is None else df, meta)
+            return df, meta
+
+    # 처음 읽을 때는 줄바꿈 없는 마지막 줄까지 읽는다 (덜 쓰인 줄이었다면 파일이 커질 때 source_change 가 다시 읽게 한다).
+    # 캐시 이후에 잘리거나 교체된 파일은 아직 쓰는 중이므로 완결된 줄까지만 읽고, 마지막 줄은 파일이 멈춘 뒤 read_tail 이 읽는다.
+    stat = os.stat(path)
+    end = stat.st_size if change is None else _complete_end(path, stat.st_size)
+    with span('parse') as sp:
+        df, report = read_crawllog(path, 0, end)
+        sp['rows'] = len(df)
+    meta = _advance_meta(path, _new_meta(path, stat), end, report)
+    _save_cache(path, df, meta)
+    return df, meta
+
+
+# -----------------------------------------------------------------------------
+# 0-3. 집계 큐브 (세 챕터의 모든 지표/차트는 부분 큐브 두 개를 잘라서 만든다) + 이어 읽기 상태
+# -----------------------------------------------------------------------------
+# 층별 위험 몬스터 탭의 구역. 층 이름(D:3) 이나 브랜치 이름(Lair, Elf...) 이 정확히 일치해야 속한다.
+ZONES = {
+    "🌱 초반": ["D:1", "D:2", "D:3", "D:4", "D:5", "D:6", "D:7", "D:8", "D:9", "D:10", "D:11", "D:12", "D:13", "D:14", "D:15", "Temple"],
+    "⚔️ 중반": ["Lair", "Orc", "Snake", "Spider", "Shoals", "Swamp"],
+    "🔥 후반": ["Vaults", "Depths", "Elf", "Crypt", "Slime", "Zot", "Hell", "Pan", "Tomb", "Abyss"],
+}
+ZONE_OF = {p: zone for zone, places in ZONES.items() for p in places}
+FLOOR_TOP_N = 3
+
+WIN_DIMS = ['race_grouped', 'cls', 'god']
+
+
+def build_cube(df, dims):
+    # 차원 조합별 게임 수 n
+    with span('build_cube', len(df)):
+        keys = df[[d for d in dims if d != 'is_oneshot']]
+        if 'is_oneshot' in dims:
+            keys = keys.assign(is_oneshot=(df['tdam'] >= df['mhp']).fillna(False).to_numpy(dtype=bool))
+        cube = keys.groupby(dims, observed=True, dropna=False).size()
+        return cube[cube > 0].reset_index(name='n')
+
+
+def merge_cubes(a, b, dims):
+    both = concat_rows([a, b])
+    return both.groupby(dims, observed=True, dropna=False)['n'].sum().reset_index()
+
+
+# 챕터 뷰가 실제로 쓰는 차원만 남긴 부분 큐브. 원본 행 대신 이 두 개만 있으면 모든 챕터를 그릴 수 있다.
+# 모든 차원을 한 큐브에 넣으면 (킬러 x 장소 x XL x 종족 x 직업 x 신앙) 판마다 거의 고유해서 행 수만큼 커지지만,
+# 나눠 두면 크기가 고유값 조합 수에 묶이므로 꼬리/청크별로 만들어 합쳐도 싸다.
+PARTIAL_DIMS = {
+    'games': ['race_grouped', 'cls', 'god', 'is_win'],
+    'deaths': ['killer', 'formatted_place', 'xl', 'is_death', 'is_oneshot'],
+}
+
+
+def build_partials(df):
+    return {name: build_cube(df, dims) for name, dims in PARTIAL_DIMS.items()}
+
+
+def merge_partials(a, b):
+    return {name: merge_cubes(a[name], b[name], dims) for name, dims in PARTIAL_DIMS.items()}
+
+
+def _sort_categories(cube):
+    # 카테고리를 이름순으로 맞춰 두면 동률의 순서가 읽은 순서/소스 순서/청크 경계와 상관없이 같아진다
+    cats = {c: cube[c].cat.reorder_categories(sorted(cube[c].cat.categories, key=str))
+            for c in cube.columns if isinstance(cube[c].dtype, pd.CategoricalDtype)}
+    return cube.assign(**cats)
+
+
+def _sum_by(cube, by, mask=None):
+    c = cube if mask is None else cube[mask]
+    s = c.groupby(by, observed=True)['n'].sum()
+    return s[s > 0].sort_values(ascending=False, kind='stable')
+
+
+def _win_table(cube, col, mask=None):
+    c = cube if mask is None else cube[mask]
+    s = c.assign(w=c['n'] * c['is_win']).groupby(col, observed=True).agg(Plays=('n', 'sum'), Wins=('w', 'sum'))
+    return s[s['Plays'] > 0]
+
+
+def _place_key(place):
+    return (0, int(place.split(":")[1])) if place.startswith("D:") else (1, place)
+
+
+def build_floor_index(floor, top_n=FLOOR_TOP_N):
+    # 구역 -> [(층, [(킬러, 횟수) x top_n]), ...]. 층x킬러 집계(내림차순)를 한 번 훑어서 만든다.
+    top = floor.groupby(level=0, sort=False, observed=True).head(top_n)
+    index = {zone: [] for zone in ZONES}
+    for place, killers in top.groupby(level=0, sort=False, observed=True):
+        place = str(place)
+        zone = ZONE_OF.get(place) or ZONE_OF.get(place.split(":")[0])
+        if zone:
+            index[zone].append((place, list(zip(killers.index.get_level_values(1), killers.tolist()))))
+    for floors in index.values():
+        floors.sort(key=lambda e: _place_key(e[0]))
+    return index
+
+
+def preference_views(cube):
+    # ch1: 종족/직업/신앙 선호도 + 종족 x 신앙 히트맵
+    no_god = (cube['god'] != 'No God').to_numpy()
+    views = {
+        'race_grouped': _sum_by(cube, 'race_grouped'),
+        'cls': _sum_by(cube, 'cls'),
+        'god': _sum_by(cube, 'god', no_god),
+    }
+
+    # 종족 x 신앙 히트맵 (미노타우르스/무신앙 제외, 5판 이상인 종족만)
+    heat = cube[no_god & (cube['race_grouped'] != 'Minotaur').to_numpy()]
+    with span('heatmap', len(heat)):
+        ct = heat.pivot_table(index='race_grouped', columns='god', values='n', aggfunc='sum', fill_value=0, observed=True)
+        ct = ct.loc[:, ct.sum(axis=0) > 0]
+        totals = ct.sum(axis=1)
+        views['heat'] = (ct.div(totals, axis=0) * 100).loc[totals[totals >= 5].sort_values(ascending=False, kind='stable').index]
+    return views
+
+
+def death_views(cube):
+    # ch2: 사망 원인/지역/레벨/돌연사 + 층별 지배자
+    dead = cube['is_death'].to_numpy()
+    views = {
+        'killer': _sum_by(cube, 'killer', dead),
+        'place': _sum_by(cube, 'formatted_place', dead),
+        'oneshot': _sum_by(cube, 'killer', dead & cube['is_oneshot'].to_numpy()),
+        'xl': cube[dead].groupby('xl')['n'].sum(),
+    }
+    with span('floor_index', int(dead.sum())):
+        views['floors'] = build_floor_index(_sum_by(cube, ['formatted_place', 'killer'], dead))
+    return views
+
+
+# ch3 빌드 조합: 라벨 -> 차원. 무신앙(No God)도 빌드의 한 선택으로 본다.
+COMBOS = {"종족+직업": ('race_grouped', 'cls'), "종족+신앙": ('race_grouped', 'god'), "직업+신앙": ('cls', 'god'),
+          "종족+직업+신앙": ('race_grouped', 'cls', 'god')}
+COMBO_MIN_PLAYS = 10
+WILSON_Z = 1.96  # 95%
+
+
+def wilson_lower_bound(wins, plays, z=WILSON_Z):
+    # 승률 신뢰구간의 하한. 판 수가 적어 운 좋게 높게 나온 조합일수록 많이 깎인다.
+    n = np.asarray(plays, dtype=float)
+    p = np.asarray(wins, dtype=float) / n
+    lb = (p + z * z / (2 * n) - z * np.sqrt(p * (1 - p) / n + z * z / (4 * n * n))) / (1 + z * z / n)
+    return np.clip(lb, 0, 1)
+
+
+def combo_index(cube):
+    # 관측된 조합마다 Plays/Wins/WinRate/Score(하한, %). 점수 내림차순으로 정렬해 두므로
+    # top-k 는 최소 판 수로 거른 뒤 앞에서 자르기만 하면 된다 (리런마다 groupby 하지 않는다).
+    index = {}
+    for dims in COMBOS.values():
+        t = _win_table(cube, list(dims)).reset_index()
+        t['WinRate'] = t['Wins'] / t['Plays'] * 100
+        t['Score'] = wilson_lower_bound(t['Wins'], t['Plays']) * 100
+        index[dims] = t.sort_values(['Score', 'Plays'], ascending=False, kind='stable').reset_index(drop=True)
+    return index
+
+
+def win_views(cube):
+    # ch3: 종족/직업/신앙별 판 수와 승리 수 + 빌드 조합 인덱스
+    no_god = (cube['god'] != 'No God').to_numpy()
+    views = {
+        'win_race_grouped': _win_table(cube, 'race_grouped'),
+        'win_cls': _win_table(cube, 'cls'),
+        'win_god': _win_table(cube, 'god', no_god),
+    }
+    with span('combo_index', len(cube)):
+        views['combos'] = combo_index(cube)
+    return views
+
+
+# 챕터 -> (읽는 부분 큐브, 뷰 함수)
+CHAPTER_VIEWS = {'ch1': ('games', preference_views), 'ch2': ('deaths', death_views), 'ch3': ('games', win_views)}
+
+
+def summarize(partials):
+    # 로드(또는 꼬리 반영) 시점에 한 번만 계산해 두는 챕터별 뷰. 스트리밍 모드도 같은 부분 큐브를 거친다.
+    partials = {name: _sort_categories(p) for name, p in partials.items()}
+    views = {'games': int(partials['games']['n'].sum())}
+    for chapter, (name, chapter_views) in CHAPTER_VIEWS.items():
+        with span(f'views:{chapter}', len(partials[name])):
+            views |= chapter_views(partials[name])
+    return views
+
+
+def crawllog_sources(spec=None):
+    # DCSS_SOURCES(또는 spec) 에 파일이나 디렉터리를 os.pathsep(':') 으로 나열한다. 디렉터리는 *.csv 와 logfile* 을 모두 쓴다.
+    # 설정이 없으면 CRAWLLOG_PATHS 중 처음 있는 파일 하나만 쓴다.
+    spec = os.environ.get('DCSS_SOURCES') if spec is None else spec
+    if not spec:
+        return [p for p in CRAWLLOG_PATHS if os.path.exists(p)][:1]
+    paths = []
+    for entry in filter(None, spec.split(os.pathsep)):
+        if os.path.isdir(entry):
+            names = sorted(f for f in os.listdir(entry) if f.endswith('.csv') or f.startswith('logfile'))
+            paths += [os.path.join(entry, f) for f in names if os.path.isfile(os.path.join(entry, f))]
+        elif os.path.exists(entry):
+            paths.append(entry)
+    return list(dict.fromkeys(paths))
+
+
+def _tag_source(df, path):
+    df['source'] = pd.Categorical.from_codes(np.zeros(len(df), dtype=np.int8), categories=[path])
+    return df
+
+
+def _seen_add(seen, keys):
+    # 이미 본 game_key 집합 = 크기가 큰 것부터 정렬된 uint64 배열(런)들의 리스트. 새 런은 자기보다 작거나 같은
+    # 마지막 런들과만 합친다 (이진 카운터처럼) -> 런 수도, 키 하나가 다시 합쳐지는 횟수도 O(log 판 수).
+    # 배치마다 전체 인덱스(와 해시 테이블)를 새로 만들면 판 수에 제곱으로 느려진다.
+    run = np.sort(keys)
+    if not len(run):
+        return seen
+    while seen and len(seen[-1]) <= len(run):
+        run = np.concatenate([seen.pop(), run])
+        run.sort(kind='stable')
+    seen.append(run)
+    return seen
+
+
+def _seen_contains(seen, keys):
+    # 찾을 키도 정렬해 두면 searchsorted 가 앞 결과에서 이어서 찾으므로 런이 커도 캐시 미스가 적다
+    order = np.argsort(keys)
+    needles = keys[order]
+    hit = np.zeros(len(keys), dtype=bool)
+    for run in seen:
+        i = np.searchsorted(run, needles)
+        hit[order] |= run[np.minimum(i, len(run) - 1)] == needles
+    return hit
+
+
+def _new_games(keys, seen):
+    # 이미 본 판과 같은 배치 안의 중복을 거른다 (먼저 나온 쪽이 남는다).
+    dup = pd.Index(keys).duplicated(keep='first') | _seen_contains(seen, keys)
+    return ~dup | (keys == 0)
+
+
+def _combined_report(sources, duplicates, df):
+    # bytes_per_row: 합쳐진 프레임이 실제로 차지하는 메모리 (카테고리 사전 포함) / 행 수
+    report = {k: sum(s['meta']['report'][k] for s in sources) for k in ('rows', 'bad_rows')}
+    return report | {'sources': len(sources), 'duplicates': duplicates, 'bytes_per_row': df.memory_usage(index=False, deep=True).sum() / max(len(df), 1)}
+
+
+def open_crawllog(paths):
+    # 소스마다 자기 캐시로 동시에 읽고, 소스 순서대로 합치면서 같은 판은 처음 것만 남긴다
+    # 계측 구간이 워커 스레드에서도 이번 리런의 기록으로 남도록 컨텍스트를 넘긴다
+    ctx = contextvars.copy_context()
+    with ThreadPoolExecutor(max_workers=min(len(paths), os.cpu_count() or 1)) as pool:
+        loaded = list(pool.map(lambda p: ctx.copy().run(load_crawllog, p), paths))
+    sources = [{'path': p, 'meta': meta} for p, (_, meta) in zip(paths, loaded)]
+    df = concat_rows([_tag_source(df, p) for p, (df, _) in zip(paths, loaded)])
+
+    # game_key 는 seen 인덱스에만 남기고 합쳐진 프레임에서는 뺀다 (행당 8바이트)
+    keys = df['game_key'].to_numpy()
+    keep = _new_games(keys, [])
+    df = df.drop(columns='game_key')
+    if not keep.all():
+        df = df[keep].reset_index(drop=True)
+    seen = _seen_add([], keys[keep & (keys != 0)])
+    # epoch: 상태마다 다른 값. generation 은 상태 안에서만 세므로 필터 캐시 키에는 둘 다 넣는다
+    # (모듈 전역 카운터는 스트림릿이 리런마다 스크립트를 다시 실행해서 초기화된다)
+    partials = build_partials(df)
+    return {'sources': sources, 'df': df, 'seen': seen, 'report': _combined_report(sources, int((~keep).sum()), df),
+            'partials': partials, 'views': summarize(partials), 'epoch': uuid.uuid4().hex, 'generation': 0, 'index': None,
+            'lock': threading.RLock()}
+
+
+def refresh_crawllog(state):
+    # 소스마다 뒤에 붙은 줄만 읽어서 (중복을 거른 뒤) 프레임과 부분 큐브에 접어 넣는다.
+    # 어느 한 소스라도 잘림/교체가 보이면 전체를 다시 합친다 (나머지 소스는 각자 캐시에서 읽힌다).
+    # 반환: 새로 반영된 행 수
+    with state['lock']:
+        tails = []
+        for src in state['sources']:
+            if not os.path.exists(src['path']):
+                continue
+            change = source_change(src['path'], src['meta'])
+            if change == 'same':
+                continue
+            if change == 'rotated':
+                fresh = open_crawllog([s['path'] for s in state['sources']])
+                fresh.pop('lock')
+                fresh['generation'] = state['generation'] + 1
+                state.update(fresh)
+                return len(state['df'])
+            tail, src['meta'] = read_tail(src['path'], src['meta'])
+            if tail is not None and len(tail):
+                tails.append(_tag_source(tail, src['path']))
+        if not tails:
+            return 0
+
+        tail = concat_rows(tails)
+        keys = tail['game_key'].to_numpy()
+        keep = _new_games(keys, state['seen'])
+        tail = tail[keep].drop(columns='game_key').reset_index(drop=True)
+        state['seen'] = _seen_add(state['seen'], keys[keep & (keys != 0)])
+        state['df'] = concat_rows([state['df'], tail])
+        state['report'] = _combined_report(state['sources'], state['report']['duplicates'] + int((~keep).sum()), state['df'])
+        if tail.empty:
+            return 0
+        state['partials'] = merge_partials(state['partials'], build_partials(tail))
+        state['views'] = summarize(state['partials'])
+        state['generation'] += 1
+        state['index'] = None  # 다음 필터 질의 때 다시 만든다
+        return len(tail)
+
+
+# -----------------------------------------------------------------------------
+# 0-4. 기간/버전 인덱스 (버전별 구간 안에서 종료 시각 순으로 정렬한 행 순열)
+# -----------------------------------------------------------------------------
+# 필터 질의는 버전 구간마다 searchsorted 두 번으로 자른 순열 슬라이스가 된다 (전체 마스크 없음)
+UNKNOWN_VERSION = '?'
+PERIOD_PRESETS = {"전체 기간": None, "최근 30일": 30, "최근 90일": 90, "최근 1년": 365}
+
+
+def version_group(v):
+    # '0.31.0' / '0.31-a0-12-gabc' -> '0.31'
+    m = re.match(r'(\d+)\.(\d+)', str(v))
+    return f"{m.group(1)}.{m.group(2)}" if m else UNKNOWN_VERSION
+
+
+def _version_key(label):
+    return tuple(int(x) for x in label.split('.')) if label != UNKNOWN_VERSION else (-1,)
+
+
+def build_time_index(df):
+    # order: 행 위치 순열, ends: order 순서의 종료 시각(초), ranges: 버전 -> order 안의 [a, b) (최신 버전부터)
+    groups = _recategorize(df['v'], [version_group(v) for v in df['v'].cat.categories])
+    groups = _fill_category(groups, UNKNOWN_VERSION)
+    labels = sorted(groups.cat.categories, key=_version_key)
+    codes = groups.cat.reorder_categories(labels).cat.codes.to_numpy()
+    ends = df['end'].to_numpy(dtype='datetime64[s]').astype(np.int64)  # NaT 는 가장 작은 값 -> 구간 맨 앞
+    order = np.lexsort((ends, codes))
+    if len(order) < np.iinfo(np.int32).max:
+        order = order.astype(np.int32)
+    bounds = np.searchsorted(codes[order], np.arange(len(labels) + 1))
+    ranges = {labels[i]: (int(bounds[i]), int(bounds[i + 1])) for i in reversed(range(len(labels))) if bounds[i] < bounds[i + 1]}
+    valid = df['end'].dropna()
+    span = (valid.min(), valid.max()) if len(valid) else None
+    return {'order': order, 'ends': ends[order], 'ranges': ranges, 'span': span}
+
+
+def query_rows(index, versions=None, start=None, end=None):
+    # versions 가 비어 있으면 전체 버전, start/end(초, [start, end)) 가 None 이면 그쪽은 열린 구간
+    if start is None and end is not None:
+        start = np.iinfo(np.int64).min + 1  # 기간을 한쪽이라도 주면 종료 시각이 없는 판(NaT = int64 최솟값)은 뺀다
+    parts = []
+    for v, (a, b) in index['ranges'].items():
+        if versions and v not in versions:
+            continue
+        ends = index['ends'][a:b]
+        i = a + (int(np.searchsorted(ends, start)) if start is not None else 0)
+        j = a + (int(np.searchsorted(ends, end)) if end is not None else b - a)
+        parts.append(index['order'][i:j])
+    return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+
+def time_index(state):
+    # 데이터가 바뀐 뒤 처음 필터를 쓸 때 만든다
+    with state['lock']:
+        if state['index'] is None:
+            state['index'] = build_time_index(state['df'])
+        return state['index']
+
+
+def filter_rows(state, versions=None, start=None, end=None):
+    # 프레임과 인덱스를 같은 락 안에서 잡아야 꼬리 반영과 어긋나지 않는다
+    with state['lock']:
+        return state['df'].iloc[query_rows(time_index(state), versions, start, end)]
+
+
+# -----------------------------------------------------------------------------
+# 0-5. 스트리밍 집계 (메모리보다 큰 로그: 청크마다 부분 큐브로 줄여서 합치고 원본 행은 남기지 않는다)
+# -----------------------------------------------------------------------------
+# 메모리 상한은 청크 크기 + 부분 큐브(고유값 조합 수) + 중복 제거용 game_key 인덱스(판당 8바이트) 정도다.
+# 원본 행이 없으므로 기간/버전 필터는 쓸 수 없다. 꼬리 이어 읽기는 소스별 meta (load_crawllog 와 같은 모양) 로 한다.
+STREAM_CHUNK_ROWS = 200_000
+
+
+def iter_raw_chunks(path, start, end, columns=None, chunk_rows=STREAM_CHUNK_ROWS):
+    # [start, end) 를 derive_columns 전의 원본 청크들로 읽는다. logfile 은 LOGFILE_CHUNK_BYTES 구간을 워커 수만큼씩,
+    # CSV 는 앞부분의 평균 줄 길이로 잡은 약 chunk_rows 행 구간씩 읽는다 (columns = 헤더 컬럼 목록).
+    # 바이트 구간으로 잘라야 읽는 도중 붙은 줄을 건드리지 않고 end 에서 멈춘다 (그 줄은 다음 꼬리로 읽힌다).
+    if is_logfile(path):
+        ranges = _line_ranges(path, start, end, LOGFILE_CHUNK_BYTES)
+        workers = min(len(ranges), os.cpu_count() or 1)
+        if workers <= 1:
+            for r in ranges:
+                yield _parse_logfile_range(path, *r)
+            return
+        with _process_pool(workers) as pool:
+            for i in range(0, len(ranges), workers):
+                starts, ends = zip(*ranges[i:i + workers])
+                yield from pool.map(_parse_logfile_range, [path] * len(starts), starts, ends)
+        return
+
+    args = _csv_read_args(columns)
+    with open(path, 'rb') as f:
+        start = max(start, len(f.readline()))
+        sample = f.read(1 << 16)
+    line = len(sample) / max(sample.count(b'\n'), 1)
+    for a, b in _line_ranges(path, start, end, max(int(chunk_rows * line), 1)):
+        chunk = _read_csv_range(path, a, b, args) if b > a else None
+        if chunk is not None and len(chunk):
+            yield chunk
+
+
+def _stream_range(state, path, start, end, columns):
+    # [start, end) 를 청크마다 (중복을 거른 뒤) 부분 큐브로 줄여 state 에 접어 넣는다. 반환: 이 구간의 파싱 리포트
+    report = {'rows': 0, 'bad_rows': 0}
+    for raw in iter_raw_chunks(path, start, end, columns, state['chunk_rows']):
+        with span('chunk', len(raw)):
+            df, bad = derive_columns(raw.reset_index(drop=True))
+            keys = df['game_key'].to_numpy()
+            keep = _new_games(keys, state['seen'])
+            state['seen'] = _seen_add(state['seen'], keys[keep & (keys != 0)])
+            state['partials'] = merge_partials(state['partials'], build_partials(df[keep]))
+            state['report']['duplicates'] += int((~keep).sum())
+            report = {'rows': report['rows'] + len(df), 'bad_rows': report['bad_rows'] + bad}
+    return report
+
+
+def _stream_views(state):
+    state['report'] |= {k: sum(s['meta']['report'][k] for s in state['sources']) for k in ('rows', 'bad_rows')}
+    state['views'] = summarize(state['partials'])
+
+
+def open_stream(paths, chunk_rows=STREAM_CHUNK_ROWS, growing=False):
+    # open_crawllog 의 스트리밍판: 원본 행 없이 부분 큐브, seen, 소스별 이어 읽기 meta 만 남긴다.
+    # growing: 교체된 소스를 다시 읽을 때처럼 아직 쓰는 중일 수 있으면 완결된 줄까지만 읽는다 (load_crawllog 와 같다)
+    empty = derive_columns(pd.DataFrame(columns=list(CSV_SCHEMA), dtype='category'))[0]
+    state = {'sources': [], 'seen': [], 'partials': build_partials(empty), 'chunk_rows': chunk_rows,
+             'report': {'rows': 0, 'bad_rows': 0, 'sources': len(paths), 'duplicates': 0, 'bytes_per_row': None},
+             'lock': threading.RLock()}
+    for path in paths:
+        meta = _new_meta(path, os.stat(path))
+        end = _complete_end(path, meta['file_size']) if growing else meta['file_size']
+        report = _stream_range(state, path, 0, end, meta['columns'])
+        state['sources'].append({'path': path, 'meta': _advance_meta(path, meta, end, report)})
+    _stream_views(state)
+    return state
+
+
+def refresh_stream(state):
+    # refresh_crawllog 의 스트리밍판: 소스마다 새로 붙은 구간만 청크로 읽어 부분 큐브에 접어 넣는다 (전체를 다시 훑지 않는다).
+    # 어느 한 소스라도 잘림/교체가 보이면 처음부터 다시 스트리밍한다. 반환: 새로 반영된 판 수
+    with state['lock']:
+        games, grown = state['views']['games'], False
+        for src in state['sources']:
+            if not os.path.exists(src['path']):
+                continue
+            change = source_change(src['path'], src['meta'])
+            if change == 'same':
+                continue
+            if change == 'rotated':
+                fresh = open_stream([s['path'] for s in state['sources']], state['chunk_rows'], growing=True)
+                fresh.pop('lock')
+                state.update(fresh)
+                return state['views']['games']
+            end, src['meta'] = _tail_end(src['path'], src['meta'])
+            if end > src['meta']['offset']:
+                report = _stream_range(state, src['path'], src['meta']['offset'], end, src['meta']['columns'])
+                src['meta'] = _advance_meta(src['path'], src['meta'], end, report)
+                grown = True
+        if grown:
+            _stream_views(state)
+        return state['views']['games'] - games
+
+
+def stream_snapshot(paths, chunk_rows=STREAM_CHUNK_ROWS):
+    # open_crawllog + build_snapshot 과 같은 뷰를, 청크 하나와 부분 큐브만 메모리에 두고 만든다
+    return build_snapshot(open_stream(paths, chunk_rows)) | {'streamed': True}
+
+
+# -----------------------------------------------------------------------------
+# 0-6. 에셋 인덱스 (assets/ 는 기동 때 한 번만 훑고, 이미지는 한 번만 줄여서 인코딩한다)
+# -----------------------------------------------------------------------------
+ASSET_DIR = 'assets'
+ASSET_EXTS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+FALLBACK_SPRITE = 'fallback'  # assets/fallback.png: 스프라이트가 없을 때 쓰는 번들 이미지 (외부 링크 없음)
+
+
+def normalize_sprite_name(name):
+    # "an Orc Priest" / "orc-priest" / "orc_priest.png" -> "orc_priest"
+    s = re.sub(r"^(a|an|the) ", "", str(name).lower().strip())
+    return re.sub(r"[^a-z0-9]+", "_", s).strip("_")
+
+
+def build_asset_index(asset_dir=ASSET_DIR):
+    # 정규화된 이름 -> 파일 경로
+    index = {}
+    for root, _, files in os.walk(asset_dir):
+        for f in sorted(files):
+            stem, ext = os.path.splitext(f)
+            if ext.lower() in ASSET_EXTS:
+                index.setdefault(normalize_sprite_name(stem), os.path.join(root, f))
+    return index
+
+
+def encode_sprite(path, width=None):
+    # width 보다 크면 줄인 뒤 PNG 바이트로 (st.image 에 그대로 넘긴다)
+    from PIL import Image
+    with Image.open(path) as img:
+        if width and img.width > width:
+            img = img.resize((width, max(1, round(img.height * width / img.width))), Image.LANCZOS)
+        buf = io.BytesIO()
+        img.save(buf, format='PNG')
+    return buf.getvalue()
+
+
+# -----------------------------------------------------------------------------
+# 0-7. 차트 (집계 결과 -> Plotly Figure)
+# -----------------------------------------------------------------------------
+FIGURE_CACHE_SIZE = 64
+
+
+# [UX 개선] Plotly 차트 설정 함수 (Modebar 제거 및 깔끔한 툴팁)
+def plot_bar_dark(data, x, y, title_text, color_scale):
+    fig = px.bar(data, x=x, y=y, orientation='h', text=x, 
+                 color=x, color_continuous_scale=color_scale)
+    fig.update_layout(
+        template="plotly_dark", 
+        plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+        font=dict(color='#ffffff', size=14),
+        title=dict(text=title_text, font=dict(color='#ff4d4d', size=18)),
+        yaxis=dict(autorange="reversed", title="", tickfont=dict(color='#e0e0e0')),
+        xaxis=dict(title="", showticklabels=False),
+        coloraxis_showscale=False, 
+        margin=dict(r=20, t=30 if title_text else 0),
+        hovermode="y unified" # [추가] 툴팁 가독성 향상
+    )
+    fig.update_traces(
+        texttemplate='%{text:.1f}%', 
+        textposition='outside', 
+        textfont=dict(color='white'),
+        hovertemplate='%{y}: %{x:.1f}%<extra></extra>' # [추가] 깔끔한 호버 텍스트
+    )
+    return fig
+
+
+def plot_oneshot_bar(data):
+    fig = px.bar(data, x='Count', y='Killer', orientation='h', text='Count', 
+                 color='Count', color_continuous_scale='Oranges')
+    fig.update_layout(template="plotly_dark", coloraxis_showscale=False, 
+                      plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
+                      font=dict(color='#ffffff', size=14), yaxis=dict(autorange="reversed"), xaxis=dict(title="횟수"))
+    fig.update_traces(texttemplate='%{text}회', textposition='outside', textfont=dict(color='white'))
+    return fig
+
+
+def plot_place_treemap(data):
+    fig = px.treemap(data, path=['Place'], values='Count', color='Count', color_continuous_scale='Reds')
+    fig.update_layout(template="plotly_dark", margin=dict(t=0, l=0, r=0, b=0), font=dict(color='white'))
+    return fig
+
+
+def plot_xl_histogram(data):
+    fig = px.histogram(data, x="xl", y="Count", histfunc='sum', nbins=27, labels={'xl': '레벨 (XL)'}, color_discrete_sequence=['#ff4d4d'])
+    fig.update_layout(template="plotly_dark", bargap=0.1, plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', font=dict(color='white'), yaxis_title="사망자 수")
+    return fig
+
+
+def plot_heatmap(data):
+    fig = px.imshow(data, text_auto='.0f', aspect="auto", color_continuous_scale='Viridis',
+                    labels=dict(x="신앙", y="종족", color="비율(%)"))
+    fig.update_layout(template="plotly_dark", height=600, coloraxis_showscale=False,
+                      plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', font=dict(color='white'))
+    return fig
+
+
+FIGURES = {'bar': plot_bar_dark, 'oneshot': plot_oneshot_bar, 'treemap': plot_place_treemap,
+           'xl': plot_xl_histogram, 'heatmap': plot_heatmap}
+
+
+def ratio_top(s, label, n=10):
+    # 집계 Series -> 상위 n 개의 비율(%) 표 [label, 'Ratio']
+    top = (s / s.sum() * 100).head(n).reset_index()
+    top.columns = [label, 'Ratio']
+    return top
+
+
+def win_stats(views, col, n=10):
+    # 5판 이상인 값만 승률 순으로 상위 n 개
+    s = views[f'win_{col}'].reset_index()
+    s['WinRate'] = (s['Wins']/s['Plays'])*100
+    return s[s['Plays']>=5].sort_values('WinRate', ascending=False).head(n)
+
+
+def top_combos(views, dims, k=10, min_plays=COMBO_MIN_PLAYS):
+    # 하한 점수 순 상위 k 개 조합. Build = 'Minotaur · Berserker · Trog'
+    t = views['combos'][dims]
+    t = t[t['Plays'] >= min_plays].head(k)
+    build = t[dims[0]].astype(str)
+    for d in dims[1:]: build = build + ' · ' + t[d].astype(str)
+    return t.assign(Build=build)
+
+
+def frame_digest(data):
+    # 차트 입력(작은 집계 DataFrame)의 내용 해시: 값 + 인덱스 + 컬럼 이름
+    h = hashlib.blake2b(digest_size=16)
+    h.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    h.update(repr(list(data.columns)).encode())
+    return h.hexdigest()
+
+
+# -----------------------------------------------------------------------------
+# 0-8. 스냅샷 / 배치 모드 (streamlit 없이 집계만 미리 계산해서 파일로 내보낸다)
+# -----------------------------------------------------------------------------
+# cron 에서 `python app.py --export snapshot.pkl` 로 갱신해 두면 대시보드는 로그를 읽지 않고 스냅샷만 읽는다
+SNAPSHOT_PATH = os.environ.get('DCSS_SNAPSHOT', 'snapshot.pkl')
+SNAPSHOT_VERSION = 2  # 뷰 구성이 바뀌면 올린다 (버전이 다른 스냅샷은 무시하고 원본 로그로 띄운다)
+
+
+def build_snapshot(state):
+    # 원본 행과 부분 큐브는 빼고 화면이 읽는 뷰만 담는다. 대부분은 빌드 조합 인덱스(관측된 종족 x 직업 x 신앙 조합마다 한 행,
+    # 수천 행)라서 판 수가 아니라 조합 수에 묶인다: 1만 판 ~170KB, 100만 판 ~250KB (합성 데이터 기준)
+    return {'version': SNAPSHOT_VERSION, 'created': pd.Timestamp.now().floor('s'), 'paths': [s['path'] for s in state['sources']],
+            'report': state['report'], 'views': state['views']}
+
+
+def write_snapshot(snapshot, path):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp, path)  # 대시보드가 반쯤 쓴 파일을 읽지 않도록
+
+
+def read_snapshot(path):
+    # 읽을 수 없는 스냅샷 (깨진 파일, 다른 pandas 버전으로 만든 pickle, 모양이 다른 내용) 은 None -> 원본 로그로 띄운다
+    try:
+        with open(path, 'rb') as f:
+            snapshot = pickle.load(f)
+    except Exception:
+        return None
+    return snapshot if isinstance(snapshot, dict) and snapshot.get('version') == SNAPSHOT_VERSION else None
+
+
+def report_figures(views):
+    # 챕터 -> [(제목, Figure)]. 대시보드 각 챕터의 기본 화면과 같은 입력으로 그린다.
+    place = views['place'].head(30).reset_index()
+    place.columns = ['Place', 'Count']
+    oneshot = views['oneshot'].head(10).reset_index()
+    oneshot.columns = ['Killer', 'Count']
+    return {
+        "📊 선호도 분석": [
+            ("🧬 종족 Top 10", plot_bar_dark(ratio_top(views['race_grouped'], 'Race'), 'Ratio', 'Race', "", 'Blues')),
+            ("⚔️ 직업 Top 10", plot_bar_dark(ratio_top(views['cls'], 'Class'), 'Ratio', 'Class', "", 'Purples')),
+            ("🙏 신앙 Top 10", plot_bar_dark(ratio_top(views['god'], 'God'), 'Ratio', 'God', "", 'Greens')),
+            ("🧩 종족별 신앙 선택", plot_heatmap(views['heat'])),
+        ],
+        "💀 죽음의 기록": [
+            ("🩸 최다 사망 원인", plot_bar_dark(ratio_top(views['killer'], 'Killer'), 'Ratio', 'Killer', "", 'Reds')),
+            ("⚡ 돌연사 (One-shot)", plot_oneshot_bar(oneshot)),
+            ("📍 사망 지역 분포", plot_place_treemap(place)),
+            ("📉 사망 레벨(XL) 분포", plot_xl_histogram(views['xl'].reset_index(name='Count'))),
+        ],
+        "🏆 메타 빌드 분석": [
+            ("🧬 종족 승률", plot_bar_dark(win_stats(views, 'race_grouped'), 'WinRate', 'race_grouped', "", 'Teal')),
+            ("⚔️ 직업 승률", plot_bar_dark(win_stats(views, 'cls'), 'WinRate', 'cls', "", 'Magenta')),
+            ("🙏 신앙 승률", plot_bar_dark(win_stats(views, 'god'), 'WinRate', 'god', "", 'YlOrBr')),
+            ("🧪 빌드 조합 Top 10 (종족+직업+신앙, 승률 하한)",
+             plot_bar_dark(top_combos(views, COMBOS["종족+직업+신앙"])[['Build', 'Score']], 'Score', 'Build', "", 'Oranges')),
+        ],
+    }
+
+
+def write_html_report(snapshot, path):
+    # 외부 연결 없이 열리는 정적 HTML 한 장 (plotly.js 는 첫 차트에 한 번만 넣는다)
+    views = snapshot['views']
+    body = [f"<h1>🩸 DUNGEON CRAWL</h1><p>{views['games']:,}판 · {snapshot['created']:%Y-%m-%d %H:%M} 기준</p>"]
+    plotlyjs = True
+    for chapter, figures in report_figures(views).items():
+        body.append(f"<h2>{chapter}</h2>")
+        for title, fig in figures:
+            body.append(f"<h3>{title}</h3>" + fig.to_html(full_html=False, include_plotlyjs=plotlyjs))
+            plotlyjs = False
+        if chapter == "💀 죽음의 기록":
+            body.append("<h3>👹 층별 지배자</h3>")
+            for zone, floors in views['floors'].items():
+                rows = "".join(f"<tr><td>{escape(place)}</td><td>{escape(str(killers[0][0]))}</td><td>{killers[0][1]:,}</td>"
+                               f"<td>{escape(', '.join(str(k) for k, _ in killers[1:3]) or '없음')}</td></tr>" for place, killers in floors)
+                body.append(f"<h4>{zone}</h4><table><tr><th>층</th><th>지배자</th><th>Kills</th><th>Beware</th></tr>{rows}</table>")
+    html = ("<!DOCTYPE html><html><head><meta charset='utf-8'><title>DCSS: 죽음의 기록</title><style>"
+            "body{background:#0b0c10;color:#e0e0e0;font-family:sans-serif;max-width:1100px;margin:auto}"
+            "h1,h2,h3,h4{color:#ff4d4d}td,th{padding:4px 12px;border-bottom:1px solid #333;text-align:left}"
+            "</style></head><body>" + "\n".join(body) + "</body></html>")
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(html)
+    os.replace(tmp, path)
+
+
+def main(argv=None):
+    # 인자가 없으면 (streamlit run app.py) 대시보드, --export/--html 이 있으면 streamlit 없이 배치로 내보낸다
+    import argparse
+    parser = argparse.ArgumentParser(description="DCSS 대시보드 집계를 미리 계산해서 스냅샷/HTML 로 내보낸다")
+    parser.add_argument('--export', metavar='SNAPSHOT', help="대시보드가 읽을 스냅샷 파일 (기본 위치: snapshot.pkl 또는 DCSS_SNAPSHOT)")
+    parser.add_argument('--html', metavar='REPORT', help="정적 HTML 리포트")
+    parser.add_argument('--source', action='append', metavar='PATH', help="crawllog 파일/디렉터리, 여러 번 지정 가능 (기본: DCSS_SOURCES 또는 crawllog.csv)")
+    parser.add_argument('--stream', action='store_true', help="메모리보다 큰 로그: 원본 행을 올리지 않고 청크 단위로 집계한다")
+    parser.add_argument('--chunk-rows', type=int, default=STREAM_CHUNK_ROWS, metavar='N', help="--stream 의 CSV 청크 행 수")
+    args = parser.parse_args(argv)
+    if not (args.export or args.html):
+        run_dashboard()
+        return
+
+    paths = crawllog_sources(os.pathsep.join(args.source) if args.source else None)
+    if not paths:
+        parser.error("crawllog 파일이 없습니다")
+    snapshot = stream_snapshot(paths, args.chunk_rows) if args.stream else build_snapshot(open_crawllog(paths))
+    if args.export:
+        write_snapshot(snapshot, args.export)
+    if args.html:
+        write_html_report(snapshot, args.html)
+    report = snapshot['report']
+    print(f"{snapshot['views']['games']:,}판 (소스 {report['sources']}개, 중복 {report['duplicates']:,}, 파싱 실패 {report['bad_rows']:,}) -> "
+          + ", ".join(p for p in (args.export, args.html) if p))
+
+
+# -----------------------------------------------------------------------------
+# 0-9. 계측 (이름 붙인 구간별 시간 / 처리 행 수 / 메모리 변화)
+# -----------------------------------------------------------------------------
+# ?profile=1 이나 DCSS_PROFILE=1 이면 리런마다 구간을 모아서 사이드바에 보여주고 PROFILE_LOG 에 JSON 한 줄씩 남긴다.
+# 모으는 중이 아니면 span 은 아무것도 하지 않는다 (배치 모드, bench.py 포함).
+PROFILE_LOG = os.environ.get('DCSS_PROFILE_LOG', 'profile.jsonl')
+_PROFILE = contextvars.ContextVar('dcss_profile', default=None)
+_PROFILE_DEPTH = contextvars.ContextVar('dcss_profile_depth', default=0)
+
+
+def _rss_bytes():
+    # 현재 RSS (리눅스 /proc 기준, 없으면 None -> 메모리 변화는 비워 둔다)
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+@contextmanager
+def span(name, rows=None):
+    # 구간 기록(dict)을 넘겨주므로 처리 행 수를 끝나고 나서 채울 수 있다: with span('parse') as sp: ...; sp['rows'] = n
+    records = _PROFILE.get()
+    entry = {'span': name, 'depth': _PROFILE_DEPTH.get(), 'rows': rows}
+    if records is None:
+        yield entry
+        return
+    records.append(entry)
+    token = _PROFILE_DEPTH.set(entry['depth'] + 1)
+    rss, t = _rss_bytes(), time.perf_counter()
+    try:
+        yield entry
+    finally:
+        entry['ms'] = (time.perf_counter() - t) * 1000
+        after = _rss_bytes()
+        entry['mem_delta'] = after - rss if rss is not None and after is not None else None
+        _PROFILE_DEPTH.reset(token)
+
+
+@contextmanager
+def profiling():
+    # 블록 안에서 (같은 컨텍스트로) 실행된 span 들이 순서대로 쌓이는 리스트
+    records = []
+    token = _PROFILE.set(records)
+    try:
+        yield records
+    finally:
+        _PROFILE.reset(token)
+
+
+def write_profile(records, context, path=PROFILE_LOG):
+    # 구간 하나당 한 줄 (같은 리런은 run 값이 같다). 기록 실패는 대시보드를 막지 않는다.
+    run = {'ts': pd.Timestamp.now().isoformat(timespec='milliseconds'), 'run': f"{os.getpid()}-{time.time_ns()}"} | context
+    try:
+        with open(path, 'a', encoding='utf-8') as f:
+            for entry in records:
+                f.write(json.dumps(run | entry, ensure_ascii=False) + '\n')
+    except OSError:
+        pass
+
+
+def profile_table(records):
+    # 패널용 표: 들여쓰기로 중첩을 보여준다
+    return pd.DataFrame({
+        '구간': ['\u3000' * e['depth'] + e['span'] for e in records],
+        'ms': [round(e.get('ms', 0), 1) for e in records],
+        '행': pd.array([e['rows'] for e in records], dtype='Int64'),
+        '메모리 Δ(MB)': [None if e.get('mem_delta') is None else round(e['mem_delta'] / (1 << 20), 1) for e in records],
+    })
+
 
 # -----------------------------------------------------------------------------
 # 1. 페이지 설정 및 상태 관리
 # -----------------------------------------------------------------------------
+def profile_requested(st):
+    return bool(os.environ.get('DCSS_PROFILE') or st.query_params.get('profile') == '1')
+
+
+def show_profile(st, box, records):
+    with box:
+        st.dataframe(profile_table(records), hide_index=True, use_container_width=True)
+        st.caption(f"로그: {PROFILE_LOG}")
+
+
+def profile_context(st, **extra):
+    return {'page': st.session_state.get('page'), 'chapter': st.session_state.get('selected_chapter')} | extra
+
+
 def run_dashboard():
+    # 계측이 켜져 있으면 리런 전체를 'rerun' 구간으로 감싸고, 끝나면 로그를 남기고 사이드바에 표를 띄운다.
+    # st.rerun() 으로 끝난 리런도 로그에는 남는다 (패널은 다음 리런이 그린다).
+    # 프래그먼트만 다시 도는 리런은 render_dashboard 의 profiled_fragment 가 따로 모은다.
+    import streamlit as st
+    if not profile_requested(st):
+        render_dashboard()
+        return
+    with profiling() as records:
+        try:
+            with span('rerun'):
+                render_dashboard()
+        finally:
+            write_profile(records, profile_context(st))
+    show_profile(st, st.sidebar.expander("⏱️ 프로파일 (이번 리런)", expanded=True), records)
+
+
+def render_dashboard():
+    import streamlit as st  # 배치 모드(main 의 --export/--html)는 streamlit 을 불러오지 않는다
     st.set_page_config(page_title="DCSS: 죽음의 기록", page_icon="🩸", layout="wide")
     
     # 상태 초기화
@@ -124,72 +1362,109 @@ def run_dashboard():
     # -------------------------------------------------------------------------
     # 3. 데이터 및 에셋 로드
     # -------------------------------------------------------------------------
-    @st.cache_data
-    def load_data():
+    # 모든 세션이 같은 상태를 공유하고, 리런마다 파일 크기만 보고 새로 붙은 줄을 접어 넣는다.
+    # 소스 목록이 바뀌면 (DCSS_SOURCES 디렉터리에 새 logfile 등) 이전 상태는 버린다.
+    @st.cache_resource(max_entries=1)
+    def load_data(paths):
+        if not paths: return None
+        return open_crawllog(list(paths))
+
+    # DCSS_STREAM=1 이면 원본 행을 올리지 않고 청크 단위로 집계한다. 리런마다 소스별로 새로 붙은 구간만 청크로 접어 넣고,
+    # 잘리거나 교체된 소스가 있을 때만 처음부터 다시 집계한다.
+    @st.cache_resource(max_entries=1)
+    def stream_data(paths):
+        if not paths: return None
+        return open_stream(list(paths))
+
+    # 배치 모드로 만든 스냅샷이 있으면 로그는 건드리지 않는다. 파일이 다시 쓰이면 (mtime 이 바뀌면) 새로 읽는다.
+    @st.cache_resource(max_entries=1)
+    def load_snapshot(path, mtime_ns):
+        return read_snapshot(path)
+
+    with span('load_snapshot'):
+        snapshot = load_snapshot(SNAPSHOT_PATH, os.stat(SNAPSHOT_PATH).st_mtime_ns) if os.path.exists(SNAPSHOT_PATH) else None
+    state, new_rows = None, 0
+    if snapshot is None:
         try:
-            if not os.path.exists('crawllog.csv'): return None, None
-            df = pd.read_csv('crawllog.csv')
-            
-            if 'god' in df.columns: df['god'] = df['god'].fillna('No God')
-            if 'killer' in df.columns: df['killer'] = df['killer'].fillna('Unknown')
-            
-            cond1 = df['ktyp'].astype(str) == 'winning'
-            cond2 = df['tmsg'].astype(str).str.lower().str.contains('escaped', na=False)
-            df['is_win'] = cond1 | cond2
-            
-            df['race_grouped'] = df['race'].apply(lambda x: 'Draconian' if 'Draconian' in str(x) else x)
-
-            def format_place(row):
-                place = row['place']
-                lvl = row['lvl']
-                if place == 'D' and pd.notnull(lvl): return f"D:{int(lvl)}"
-                return str(place)
-            df['formatted_place'] = df.apply(format_place, axis=1)
-            
-            exclude = ['winning', 'quit', 'user', 'leaving', 'wizmode', 'starvation', 'Unknown', 'miscast']
-            df_death = df[~df['killer'].isin(exclude)].copy()
-            
-            return df, df_death
-        except: return None, None
+            if os.environ.get('DCSS_STREAM'):
+                with span('stream_data') as sp:
+                    stream = stream_data(tuple(crawllog_sources()))
+                    sp['rows'] = stream['report']['rows'] if stream is not None else 0
+                if stream is not None:
+                    with span('refresh') as sp:
+                        new_rows = sp['rows'] = refresh_stream(stream)
+                    snapshot = build_snapshot(stream) | {'streamed': True}
+            else:
+                with span('load_data') as sp:
+                    state = load_data(tuple(crawllog_sources()))
+                    sp['rows'] = len(state['df']) if state is not None else 0
+                with span('refresh') as sp:
+                    new_rows = sp['rows'] = refresh_crawllog(state) if state is not None else 0
+        except (pd.errors.ParserError, ValueError, KeyError) as e:
+            st.error(f"❌ 로그 파일을 읽을 수 없습니다: {e}")
+            return
 
-    df, df_death = load_data()
-    
-    if df is None:
-        st.error("❌ 'crawllog.csv' 파일이 없습니다.")
-        return
+        if state is None and snapshot is None:
+            st.error("❌ 'crawllog.csv' (또는 원본 'logfile') 파일이 없습니다. 여러 서버 로그는 DCSS_SOURCES 로 지정하세요.")
+            return
+
+    views, report = (snapshot or state)['views'], (snapshot or state)['report']
+    if new_rows:
+        st.toast(f"🆕 새 게임 {new_rows:,}건 반영")
+
+    if report['bad_rows']:
+        st.warning(f"⚠️ 파싱 실패 {report['bad_rows']:,}행 (숫자 변환 실패 또는 종족/직업 누락) / 전체 {report['rows']:,}행")
+
+    # 이미지 로드 함수: 인덱스는 프로세스당 한 번, 이미지는 (이름, 크기)별로 한 번만 인코딩해서 메모리에 둔다
+    @st.cache_resource
+    def asset_index():
+        return build_asset_index()
+
+    @st.cache_resource(max_entries=256)
+    def get_img(name, width=None):
+        index = asset_index()
+        path = index.get(normalize_sprite_name(name)) or index.get(FALLBACK_SPRITE)
+        return encode_sprite(path, width) if path else None
+
+    # 차트 캐시: (차트 종류, 스타일, 입력 집계 해시) 가 같으면 이미 만든 Figure 를 그대로 쓴다 (LRU)
+    @st.cache_resource(max_entries=FIGURE_CACHE_SIZE)
+    def cached_figure(kind, style, data_key, _data):
+        return FIGURES[kind](_data, **dict(style))
+
+    def show_chart(kind, data, **style):
+        with span(f'chart:{kind}', len(data)):
+            fig = cached_figure(kind, tuple(sorted(style.items())), frame_digest(data), data)
+        with span(f'render:{kind}'):
+            st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
+
+    # 필터 키 (버전 묶음, 기간, 상태, 데이터 세대) 별로 집계 뷰를 한 번만 만든다
+    @st.cache_resource(max_entries=32)
+    def filtered_views(versions, start, end, epoch, generation, _state):
+        return summarize(build_partials(filter_rows(_state, versions, start, end)))
+
+    def top_label(s):
+        return s.index[0] if not s.empty else "-"
 
-    # 이미지 로드 함수
-    def get_img_path(name):
-        if os.path.exists("assets"):
-            filename = f"{str(name).lower().replace(' ', '_')}.png"
-            filepath = os.path.join("assets", filename)
-            if os.path.exists(filepath): return filepath
-        if "minotaur" in str(name).lower():
-            return "https://raw.githubusercontent.com/crawl/crawl/master/crawl-ref/source/rltiles/mon/minotaur.png"
-        return "https://raw.githubusercontent.com/crawl/crawl/master/crawl-ref/source/rltiles/mon/demon_spawn.png"
-
-    # [UX 개선] Plotly 차트 설정 함수 (Modebar 제거 및 깔끔한 툴팁)
-    def plot_bar_dark(data, x, y, title_text, color_scale):
-        fig = px.bar(data, x=x, y=y, orientation='h', text=x, 
-                     color=x, color_continuous_scale=color_scale)
-        fig.update_layout(
-            template="plotly_dark", 
-            plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
-            font=dict(color='#ffffff', size=14),
-            title=dict(text=title_text, font=dict(color='#ff4d4d', size=18)),
-            yaxis=dict(autorange="reversed", title="", tickfont=dict(color='#e0e0e0')),
-            xaxis=dict(title="", showticklabels=False),
-            coloraxis_showscale=False, 
-            margin=dict(r=20, t=30 if title_text else 0),
-            hovermode="y unified" # [추가] 툴팁 가독성 향상
-        )
-        fig.update_traces(
-            texttemplate='%{text:.1f}%', 
-            textposition='outside', 
-            textfont=dict(color='white'),
-            hovertemplate='%{y}: %{x:.1f}%<extra></extra>' # [추가] 깔끔한 호버 텍스트
-        )
-        return fig
+    # st.fragment + 계측. 섹션/구역/조합 클릭은 프래그먼트만 다시 돌아 run_dashboard 의 수집기 밖이므로 여기서 따로 모아
+    # 로그에 남기고 프래그먼트 안에 표를 띄운다 (프래그먼트는 사이드바에 쓸 수 없다). 전체 리런 안에서는 바깥 수집기에 쌓인다.
+    def profiled_fragment(fn):
+        @st.fragment
+        @functools.wraps(fn)
+        def run():
+            if _PROFILE.get() is not None or not profile_requested(st):
+                return fn()
+            with profiling() as records:
+                try:
+                    with span(f'fragment:{fn.__name__}'):
+                        fn()
+                finally:
+                    write_profile(records, profile_context(st, fragment=fn.__name__))
+            show_profile(st, st.expander("⏱️ 프로파일 (이 섹션 리런)", expanded=True), records)
+        return run
+
+    # st.tabs 는 안 보이는 탭까지 매번 전부 실행하므로, 고른 섹션 하나만 그리는 선택 바를 쓴다
+    def section_picker(options, key):
+        return st.segmented_control("보기", options, default=options[0], key=key, label_visibility='collapsed') or options[0]
 
     # -------------------------------------------------------------------------
     # 4. 화면 라우팅
@@ -205,11 +1480,10 @@ def run_dashboard():
         col_l, col_c, col_r = st.columns([1, 0.8, 1]) 
         
         with col_c:
-            banner_path = os.path.join("assets", "main_banner.png")
-            if os.path.exists(banner_path):
-                st.image(banner_path, use_container_width=True)
-            else:
-                 st.image(get_img_path("minotaur"), width=200)
+            if "main_banner" in asset_index():
+                st.image(get_img("main_banner"), use_container_width=True)
+            elif get_img("minotaur", 200):
+                st.image(get_img("minotaur", 200), width=200)
 
             st.markdown("<br>", unsafe_allow_html=True)
             
@@ -267,6 +1541,40 @@ def run_dashboard():
             if st.button("🔙 목록", use_container_width=True):
                 st.session_state.page = 'chapter_select'
                 st.rerun()
+        # 사이드바 필터: 버전(복수 선택, 비우면 전체) + 종료 날짜 기간. 기간은 로그의 마지막 게임 기준이다.
+        all_views, versions, start, end = views, [], None, None
+        with st.sidebar:
+            st.markdown("### 🔎 필터")
+            if state is None:
+                kind = "스트리밍 집계" if snapshot.get('streamed') else "스냅샷"
+                st.caption(f"📦 {kind} ({snapshot['created']:%Y-%m-%d %H:%M}) 으로 띄운 화면입니다. 버전/기간 필터는 원본 로그를 메모리에 올려 띄울 때만 쓸 수 있습니다.")
+            else:
+                index = time_index(state)
+                versions = st.multiselect("버전", list(index['ranges']), placeholder="전체 버전")
+                if index['span'] is not None:
+                    lo, hi = index['span']
+                    preset = st.selectbox("기간", list(PERIOD_PRESETS) + ["직접 선택"])
+                    if preset == "직접 선택":
+                        picked = st.date_input("종료 날짜", value=(lo.date(), hi.date()), min_value=lo.date(), max_value=hi.date())
+                        if len(picked) == 2:
+                            start, end = pd.Timestamp(picked[0]), pd.Timestamp(picked[1]) + pd.Timedelta(days=1)
+                    elif PERIOD_PRESETS[preset]:
+                        start, end = hi.normalize() - pd.Timedelta(days=PERIOD_PRESETS[preset] - 1), hi.normalize() + pd.Timedelta(days=1)
+        if versions or start is not None:
+            seconds = [None if t is None else int(t.timestamp()) for t in (start, end)]
+            with span('filter') as sp:
+                views = filtered_views(tuple(sorted(versions)), *seconds, state['epoch'], state['generation'], state)
+                sp['rows'] = views['games']
+
+        with col_nav2:
+            info = f"💾 {views['games']:,}판"
+            if views is not all_views: info += f" (전체 {all_views['games']:,}판 중)"
+            if report['bytes_per_row'] is not None: info += f" · {report['bytes_per_row']:.1f} B/판"
+            if report['sources'] > 1: info += f" · 📂 소스 {report['sources']}개 · 중복 제거 {report['duplicates']:,}판"
+            st.caption(info)
+        if not views['games']:
+            st.info("선택한 버전/기간에 해당하는 게임이 없습니다.")
+            return
         
         # ---------------------------------------------------------------------
         # Ch1: 선호도 분석 (Insight-First 적용)
@@ -276,45 +1584,25 @@ def run_dashboard():
             
             # [UX 개선] 핵심 지표(Metrics) 상단 노출
             m1, m2, m3 = st.columns(3)
-            with m1: st.metric("가장 사랑받는 종족", df['race_grouped'].mode()[0])
-            with m2: st.metric("가장 사랑받는 직업", df['cls'].mode()[0])
-            with m3: st.metric("가장 사랑받는 신", df[df['god']!='No God']['god'].mode()[0])
+            with m1: st.metric("가장 사랑받는 종족", top_label(views['race_grouped']))
+            with m2: st.metric("가장 사랑받는 직업", top_label(views['cls']))
+            with m3: st.metric("가장 사랑받는 신", top_label(views['god']))
             st.markdown("---")
 
             col1, col2, col3 = st.columns(3)
             with col1:
                 st.markdown("#### 🧬 종족 Top 10")
-                cnt = df['race_grouped'].value_counts(normalize=True)*100
-                top = cnt.head(10).reset_index()
-                top.columns = ['Race', 'Ratio']
-                # config={'displayModeBar': False} 추가로 차트 깔끔하게
-                st.plotly_chart(plot_bar_dark(top, 'Ratio', 'Race', "", 'Blues'), use_container_width=True, config={'displayModeBar': False})
+                show_chart('bar', ratio_top(views['race_grouped'], 'Race'), x='Ratio', y='Race', title_text="", color_scale='Blues')
             with col2:
                 st.markdown("#### ⚔️ 직업 Top 10")
-                cnt = df['cls'].value_counts(normalize=True)*100
-                top = cnt.head(10).reset_index()
-                top.columns = ['Class', 'Ratio']
-                st.plotly_chart(plot_bar_dark(top, 'Ratio', 'Class', "", 'Purples'), use_container_width=True, config={'displayModeBar': False})
+                show_chart('bar', ratio_top(views['cls'], 'Class'), x='Ratio', y='Class', title_text="", color_scale='Purples')
             with col3:
                 st.markdown("#### 🙏 신앙 Top 10")
-                df_god = df[df['god'] != 'No God']
-                cnt = df_god['god'].value_counts(normalize=True)*100
-                top = cnt.head(10).reset_index()
-                top.columns = ['God', 'Ratio']
-                st.plotly_chart(plot_bar_dark(top, 'Ratio', 'God', "", 'Greens'), use_container_width=True, config={'displayModeBar': False})
+                show_chart('bar', ratio_top(views['god'], 'God'), x='Ratio', y='God', title_text="", color_scale='Greens')
 
             st.markdown("---")
             st.subheader("🧩 종족별 신앙 선택")
-            df_heat = df[(df['race'] != 'Minotaur') & (df['god'] != 'No God')]
-            ct = pd.crosstab(df_heat['race_grouped'], df_heat['god'])
-            ct_norm = ct.div(ct.sum(axis=1), axis=0) * 100
-            valid = df_heat['race_grouped'].value_counts()[df_heat['race_grouped'].value_counts() >= 5].index
-            ct_norm = ct_norm.loc[valid]
-            fig = px.imshow(ct_norm, text_auto='.0f', aspect="auto", color_continuous_scale='Viridis',
-                            labels=dict(x="신앙", y="종족", color="비율(%)"))
-            fig.update_layout(template="plotly_dark", height=600, coloraxis_showscale=False,
-                              plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', font=dict(color='white'))
-            st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
+            show_chart('heatmap', views['heat'])
 
         # ---------------------------------------------------------------------
         # Ch2: 죽음의 기록 (Insight-First 적용)
@@ -324,76 +1612,58 @@ def run_dashboard():
             
             # [UX 개선] 사망 관련 핵심 지표
             m1, m2, m3 = st.columns(3)
-            with m1: st.metric("총 사망 기록", f"{len(df_death):,} 회")
-            with m2: st.metric("최대 사망 원인", df_death['killer'].mode()[0])
-            with m3: st.metric("가장 위험한 층", df_death['formatted_place'].mode()[0])
+            with m1: st.metric("총 사망 기록", f"{views['killer'].sum():,} 회")
+            with m2: st.metric("최대 사망 원인", top_label(views['killer']))
+            with m3: st.metric("가장 위험한 층", top_label(views['place']))
             st.markdown("---")
 
-            tab1, tab2 = st.tabs(["📉 통계 요약", "👹 층별 위험 몬스터"])
-            with tab1:
-                c1, c2 = st.columns(2)
-                with c1:
-                    st.markdown("#### 🩸 최다 사망 원인")
-                    cnt = df_death['killer'].value_counts(normalize=True)*100
-                    top = cnt.head(10).reset_index()
-                    top.columns = ['Killer', 'Ratio']
-                    st.plotly_chart(plot_bar_dark(top, 'Ratio', 'Killer', "", 'Reds'), use_container_width=True, config={'displayModeBar': False})
-                with c2:
-                    st.markdown("#### ⚡ 돌연사 (One-shot)")
-                    sudden = df_death[df_death['tdam'] >= df_death['mhp']]
-                    if not sudden.empty:
-                        cnt = sudden['killer'].value_counts().head(10).reset_index()
-                        cnt.columns = ['Killer', 'Count']
-                        fig = px.bar(cnt, x='Count', y='Killer', orientation='h', text='Count', 
-                                     color='Count', color_continuous_scale='Oranges')
-                        fig.update_layout(template="plotly_dark", coloraxis_showscale=False, 
-                                          plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)',
-                                          font=dict(color='#ffffff', size=14), yaxis=dict(autorange="reversed"), xaxis=dict(title="횟수"))
-                        fig.update_traces(texttemplate='%{text}회', textposition='outside', textfont=dict(color='white'))
-                        st.plotly_chart(fig, use_container_width=True, config={'displayModeBar': False})
-
-                c3, c4 = st.columns(2)
-                with c3:
-                    st.subheader("📍 사망 지역 분포")
-                    place_cnt = df_death['formatted_place'].value_counts().reset_index()
-                    place_cnt.columns = ['Place', 'Count']
-                    fig_tree = px.treemap(place_cnt.head(30), path=['Place'], values='Count', color='Count', color_continuous_scale='Reds')
-                    fig_tree.update_layout(template="plotly_dark", margin=dict(t=0, l=0, r=0, b=0), font=dict(color='white'))
-                    st.plotly_chart(fig_tree, use_container_width=True, config={'displayModeBar': False})
-                with c4:
-                    st.subheader("📉 사망 레벨(XL) 분포")
-                    fig_xl = px.histogram(df_death, x="xl", nbins=27, labels={'xl': '레벨 (XL)'}, color_discrete_sequence=['#ff4d4d'])
-                    fig_xl.update_layout(template="plotly_dark", bargap=0.1, plot_bgcolor='rgba(0,0,0,0)', paper_bgcolor='rgba(0,0,0,0)', font=dict(color='white'), yaxis_title="사망자 수")
-                    st.plotly_chart(fig_xl, use_container_width=True, config={'displayModeBar': False})
-
-            with tab2:
-                st.subheader("👹 층별 지배자")
-                zone_tabs = st.tabs(["🌱 초반", "⚔️ 중반", "🔥 후반"])
-                zones = {"🌱 초반": ["D:1", "D:2", "D:3", "D:4", "D:5", "D:6", "D:7", "D:8", "D:9", "D:10", "D:11", "D:12", "D:13", "D:14", "D:15", "Temple"], "⚔️ 중반": ["Lair", "Orc", "Snake", "Spider", "Shoals", "Swamp"], "🔥 후반": ["Vaults", "Depths", "Elf", "Crypt", "Slime", "Zot", "Hell", "Pan", "Tomb", "Abyss"]}
-                for tab, (zone_name, places) in zip(zone_tabs, zones.items()):
-                    with tab:
-                        target_places = []
-                        for p in places:
-                            found = df_death[df_death['formatted_place'].astype(str).str.contains(p, regex=False)]['formatted_place'].unique()
-                            target_places.extend(found)
-                        target_places = sorted(list(set(target_places)), key=lambda s: (0, int(s.split(":")[1])) if "D:" in s else (1, s))
-                        if not target_places: st.info("데이터 없음"); continue
-
-                        for place in target_places:
-                            floor_data = df_death[df_death['formatted_place'] == place]
-                            if floor_data.empty: continue
-                            killers = floor_data['killer'].value_counts()
-                            top1 = killers.index[0]
-                            count1 = killers.iloc[0]
-                            subs = [f"{killers.index[i]}" for i in range(1, min(3, len(killers)))]
+            # 고른 섹션만 계산/렌더하고, 섹션을 바꾸면 이 프래그먼트만 다시 돈다
+            @profiled_fragment
+            def death_sections():
+                section = section_picker(["📉 통계 요약", "👹 층별 위험 몬스터"], 'ch2_section')
+                if section == "📉 통계 요약":
+                    c1, c2 = st.columns(2)
+                    with c1:
+                        st.markdown("#### 🩸 최다 사망 원인")
+                        show_chart('bar', ratio_top(views['killer'], 'Killer'), x='Ratio', y='Killer', title_text="", color_scale='Reds')
+                    with c2:
+                        st.markdown("#### ⚡ 돌연사 (One-shot)")
+                        if not views['oneshot'].empty:
+                            cnt = views['oneshot'].head(10).reset_index()
+                            cnt.columns = ['Killer', 'Count']
+                            show_chart('oneshot', cnt)
+
+                    c3, c4 = st.columns(2)
+                    with c3:
+                        st.subheader("📍 사망 지역 분포")
+                        place_cnt = views['place'].reset_index()
+                        place_cnt.columns = ['Place', 'Count']
+                        show_chart('treemap', place_cnt.head(30))
+                    with c4:
+                        st.subheader("📉 사망 레벨(XL) 분포")
+                        xl_cnt = views['xl'].reset_index(name='Count')
+                        show_chart('xl', xl_cnt)
+
+                else:
+                    st.subheader("👹 층별 지배자")
+                    zone_name = section_picker(list(ZONES), 'ch2_zone')
+                    floors = views['floors'][zone_name]
+                    if not floors: st.info("데이터 없음"); return
+
+                    with span('floor_cards', len(floors)):
+                        for place, killers in floors:
+                            top1, count1 = killers[0]
+                            subs = [f"{k}" for k, _ in killers[1:3]]
                             sub_text = ", ".join(subs) if subs else "없음"
                             danger_idx = "🩸" if count1 < 20 else ("🩸🩸" if count1 < 50 else "💀💀💀")
-                            
+
                             with st.container():
                                 c_info, c_stat = st.columns([5.5, 1.5])
                                 with c_info: st.markdown(f"<div class='mob-card'><div><span class='floor-tag'>{place}</span><span class='killer-name'>{top1}</span><div class='sub-killers'>Beware: {sub_text}</div></div></div>", unsafe_allow_html=True)
                                 with c_stat: st.markdown(f"<div style='text-align:right; margin-top:10px;'><div style='font-size:1.4rem; color:#ff4d4d; font-weight:bold;'>{count1} Kills</div><div style='font-size:0.8rem; color:#888;'>{danger_idx}</div></div>", unsafe_allow_html=True)
 
+            death_sections()
+
         # ---------------------------------------------------------------------
         # Ch3: 메타 빌드 분석 (Insight-First 적용)
         # ---------------------------------------------------------------------
@@ -401,13 +1671,8 @@ def run_dashboard():
             st.header("🏆 메타 빌드 분석")
             st.info("썩은물들의 기록이 반영된 데이터입니다. 승률은 성능을 보장하지 않습니다.")
 
-            def get_win_stats(col):
-                s = df.groupby(col).agg(Plays=('is_win','count'), Wins=('is_win','sum')).reset_index()
-                s['WinRate'] = (s['Wins']/s['Plays'])*100
-                return s[s['Plays']>=5].sort_values('WinRate', ascending=False).head(10)
-            
             # [UX 개선] 승률 데이터 미리 계산
-            race_win = get_win_stats('race_grouped')
+            race_win = win_stats(views, 'race_grouped')
             best_race = race_win.iloc[0]['race_grouped'] if not race_win.empty else "-"
             best_rate = race_win.iloc[0]['WinRate'] if not race_win.empty else 0
 
@@ -417,15 +1682,31 @@ def run_dashboard():
             with m2: st.metric("해당 승률", f"{best_rate:.1f}%")
             st.markdown("---")
 
-            t1, t2, t3 = st.tabs(["🧬 종족", "⚔️ 직업", "🙏 신앙"])
-            with t1: st.plotly_chart(plot_bar_dark(race_win, 'WinRate', 'race_grouped', "", 'Teal'), use_container_width=True, config={'displayModeBar': False})
-            with t2: st.plotly_chart(plot_bar_dark(get_win_stats('cls'), 'WinRate', 'cls', "", 'Magenta'), use_container_width=True, config={'displayModeBar': False})
-            with t3:
-                df_god_only = df[df['god'] != 'No God']
-                s = df_god_only.groupby('god').agg(Plays=('is_win','count'), Wins=('is_win','sum')).reset_index()
-                s['WinRate'] = (s['Wins']/s['Plays'])*100
-                data = s[s['Plays']>=5].sort_values('WinRate', ascending=False).head(10)
-                st.plotly_chart(plot_bar_dark(data, 'WinRate', 'god', "", 'YlOrBr'), use_container_width=True, config={'displayModeBar': False})
+            win_dims = {"🧬 종족": ('race_grouped', 'Teal'), "⚔️ 직업": ('cls', 'Magenta'), "🙏 신앙": ('god', 'YlOrBr')}
+
+            @profiled_fragment
+            def win_sections():
+                section = section_picker(list(win_dims) + ["🧪 빌드 조합"], 'ch3_section')
+                if section in win_dims:
+                    col, color = win_dims[section]
+                    data = race_win if col == 'race_grouped' else win_stats(views, col)
+                    show_chart('bar', data, x='WinRate', y=col, title_text="", color_scale=color)
+                    return
+
+                # 조합은 로드 때 만든 인덱스에서 판 수로 거르고 앞에서 자르기만 한다
+                c_combo, c_min = st.columns([3, 1])
+                with c_combo: combo = section_picker(list(COMBOS), 'ch3_combo')
+                with c_min: min_plays = st.number_input("최소 판 수", min_value=1, value=COMBO_MIN_PLAYS, step=5, key='ch3_min_plays')
+                top = top_combos(views, COMBOS[combo], 10, min_plays)
+                if top.empty: st.info(f"{min_plays}판 이상 기록된 조합이 없습니다."); return
+
+                st.caption("승률 95% 신뢰구간의 하한(Wilson)으로 줄 세웁니다. 판 수가 적어 운이 좋았던 조합은 아래로 내려갑니다.")
+                show_chart('bar', top[['Build', 'Score']], x='Score', y='Build', title_text="", color_scale='Oranges')
+                table = top[['Build', 'Plays', 'Wins', 'WinRate', 'Score']].round(1)
+                table.columns = ['조합', '판 수', '승리', '승률(%)', '하한(%)']
+                st.dataframe(table, hide_index=True, use_container_width=True)
+
+            win_sections()
 
 if __name__ == "__main__":
-    run_dashboard()
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,365 @@
+# -----------------------------------------------------------------------------
+# 데이터 파이프라인 벤치마크 (streamlit 없이 app.py 의 로드/집계 단계를 잰다)
+#
+#   python bench.py                          # 10k / 1m / 10m 행
+#   python bench.py --sizes 10k 1m --format logfile --out bench-logfile.json
+#   python bench.py --compare bench_results.json   # 이전 결과와 단계별 시간 비교
+#   python bench.py --check --sizes 10k 200k       # 시간 대신 뷰 일치 검사 (다르면 종료 코드 1)
+#
+# 합성 crawllog 는 --data-dir 에 (행 수, 형식, 시드) 별로 한 번만 만들어 두고 다시 쓴다.
+# 단계마다 벽시계 시간을 재고 (stream 은 원본 행을 올리지 않는 청크 집계 경로), 메모리는 같은 단계를 tracemalloc 아래에서 한 번 더 돌려
+# 최대 할당량을 기록한다 (--no-memory 로 생략). 결과는 JSON 한 파일로 남긴다.
+# -----------------------------------------------------------------------------
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import app
+
+DEFAULT_SIZES = ['10k', '1m', '10m']
+GEN_CHUNK_ROWS = 1_000_000
+CSV_COLUMNS = ['name', 'start', 'end', 'v', 'race', 'cls', 'god', 'killer', 'ktyp', 'tmsg', 'place', 'lvl', 'xl', 'tdam', 'mhp']
+
+# 분포는 실제 서버 로그와 대략 비슷하게: 드라코니언은 색깔별 변종 + 아직 색이 없는 'Draconian'
+RACES = {
+    'Minotaur': 9, 'Human': 6, 'Deep Elf': 7, 'Gargoyle': 5, 'Merfolk': 4, 'Spriggan': 4, 'Troll': 4, 'Vampire': 3,
+    'Hill Orc': 5, 'Kobold': 3, 'Demigod': 3, 'Felid': 4, 'Octopode': 3, 'Naga': 3, 'Tengu': 3, 'Mummy': 2, 'Ghoul': 2,
+    'Draconian': 3, 'Red Draconian': 1, 'White Draconian': 1, 'Green Draconian': 1, 'Yellow Draconian': 1,
+    'Grey Draconian': 1, 'Black Draconian': 1, 'Purple Draconian': 1, 'Mottled Draconian': 1, 'Pale Draconian': 1,
+}
+CLASSES = {
+    'Fighter': 9, 'Berserker': 8, 'Gladiator': 5, 'Hunter': 4, 'Wizard': 5, 'Conjurer': 3, 'Fire Elementalist': 4,
+    'Ice Elementalist': 3, 'Earth Elementalist': 2, 'Air Elementalist': 2, 'Necromancer': 3, 'Monk': 4, 'Brigand': 2,
+    'Chaos Knight': 2, 'Summoner': 2, 'Transmuter': 2, 'Artificer': 2, 'Shapeshifter': 1, 'Warper': 1, 'Hexslinger': 1,
+}
+GODS = {
+    None: 12, 'Trog': 10, 'Okawaru': 8, 'Makhleb': 6, 'Vehumet': 5, 'Sif Muna': 4, 'Zin': 3, 'The Shining One': 3,
+    'Elyvilon': 2, 'Gozag': 3, 'Ru': 4, 'Qazlal': 2, 'Kikubaaqudgha': 2, 'Yredelemnul': 2, 'Xom': 1, 'Uskayaw': 1,
+}
+# 진행도(XL) 구간별 사망 장소 {브랜치: (최소 층, 최대 층, 가중치)} 와 가해자
+STAGES = [
+    (1, 6, {'D': (1, 6, 1)}, {'a hobgoblin': 5, 'a jackal': 5, 'Sigmund': 4, 'an orc': 4, 'Grinder': 3, 'a gnoll': 4, 'Jessica': 2, 'an adder': 2}),
+    (6, 13, {'D': (5, 15, 6), 'Lair': (1, 5, 3), 'Orc': (1, 2, 2), 'Temple': (1, 1, 0.2)},
+     {'an orc priest': 3, 'an ogre': 4, 'a hydra': 4, 'Erolcha': 2, 'a black bear': 2, 'an orc warrior': 3, 'Sonja': 1, 'a centaur': 2}),
+    (13, 21, {'Snake': (1, 4, 2), 'Spider': (1, 4, 2), 'Shoals': (1, 4, 2), 'Swamp': (1, 4, 2), 'Vaults': (1, 5, 3), 'Elf': (1, 3, 2)},
+     {'a deep elf annihilator': 2, 'a naga sharpshooter': 2, 'a merfolk javelineer': 3, 'a deep troll': 2, 'a vault sentinel': 2,
+      'a spriggan berserker': 2, 'Nikola': 1, 'a swamp dragon': 2}),
+    (21, 28, {'Depths': (1, 4, 4), 'Zot': (1, 5, 3), 'Crypt': (1, 3, 1), 'Tomb': (1, 3, 1), 'Pan': (1, 1, 1), 'Hell': (1, 1, 1),
+              'Abyss': (1, 7, 1), 'Slime': (1, 5, 1)},
+     {'an orb of fire': 3, 'an ancient lich': 2, 'a tentacled monstrosity': 2, 'a shard shrike': 2, 'an executioner': 2,
+      'a titan': 2, 'a greater mummy': 1, 'the Royal Jelly': 1}),
+]
+VERSIONS = [('0.29', '2022-08-01'), ('0.30', '2023-05-01'), ('0.31', '2024-01-01'), ('0.32', '2024-08-01')]
+TIME_SPAN = (pd.Timestamp('2022-08-01'), pd.Timestamp('2025-02-01'))
+
+
+def parse_size(text):
+    # '10k' / '1m' / '2500' -> 행 수
+    text = text.lower()
+    scale = {'k': 1_000, 'm': 1_000_000}.get(text[-1], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def _pick(rng, weights, n):
+    keys = list(weights)
+    p = np.array(list(weights.values()), dtype=float)
+    return np.array(keys, dtype=object)[rng.choice(len(keys), n, p=p / p.sum())]
+
+
+def _dcss_time(t):
+    # DCSS 종료 시각 'YYYYMMDDhhmmssS' (월은 0부터)
+    t = pd.DatetimeIndex(t)
+    digits = (t.year.astype(np.int64) * 10**10 + (t.month.astype(np.int64) - 1) * 10**8 + t.day.astype(np.int64) * 10**6
+              + t.hour.astype(np.int64) * 10**4 + t.minute.astype(np.int64) * 100 + t.second.astype(np.int64))
+    return pd.Series(digits.astype(str)) + 'S'
+
+
+def synth_chunk(rng, n):
+    # n 판 분량의 crawllog 행. 승률 ~1.5%, 종료 ~8%, 나머지는 XL 에 맞는 장소/몬스터에게 사망.
+    xl = np.clip(np.round(1 + rng.gamma(1.6, 4.0, n)), 1, 27).astype(int)
+    outcome = rng.choice(3, n, p=[0.015, 0.08, 0.905])  # 0 승리, 1 종료, 2 사망
+    xl[outcome == 0] = rng.integers(24, 28, (outcome == 0).sum())
+
+    place = np.empty(n, dtype=object)
+    lvl = np.ones(n, dtype=int)
+    killer = np.full(n, None, dtype=object)
+    for lo, hi, places, killers in STAGES:
+        m = (xl >= lo) & (xl < hi)
+        k = int(m.sum())
+        names = np.array(list(places), dtype=object)
+        lo_lvl, hi_lvl, weight = np.array(list(places.values())).T
+        pick = rng.choice(len(names), k, p=weight / weight.sum())
+        lo_lvl, hi_lvl = lo_lvl.astype(int), hi_lvl.astype(int)
+        place[m], lvl[m] = names[pick], rng.integers(lo_lvl[pick], hi_lvl[pick] + 1)
+        killer[m] = _pick(rng, killers, k)
+    win, quit_ = outcome == 0, outcome == 1
+    place[win], lvl[win] = 'D', 1
+    killer[win | quit_] = None
+
+    ktyp = rng.choice(['mon', 'beam', 'pois', 'cloud'], n, p=[0.8, 0.12, 0.05, 0.03]).astype(object)
+    ktyp[win], ktyp[quit_] = 'winning', 'quitting'
+    tmsg = np.where(win, 'escaped with the Orb', np.where(quit_, 'quit the game', 'slain by a monster')).astype(object)
+
+    mhp = np.round(10 + xl * 8 * rng.uniform(0.7, 1.3, n)).astype(int)
+    tdam = np.round(mhp * rng.beta(1.2, 3.0, n) * 1.6).astype(int)
+
+    start = TIME_SPAN[0] + pd.to_timedelta(np.sort(rng.integers(0, int((TIME_SPAN[1] - TIME_SPAN[0]).total_seconds()), n)), unit='s')
+    end = start + pd.to_timedelta(rng.integers(600, 40 * 3600, n), unit='s')
+    majors = np.array([major + '.' for major, _ in VERSIONS], dtype=object)
+    releases = pd.DatetimeIndex([pd.Timestamp(d) for _, d in VERSIONS])
+    v = majors[np.clip(releases.searchsorted(start, 'right') - 1, 0, None)] + rng.integers(0, 3, n).astype(str)
+
+    return pd.DataFrame({
+        'name': 'player' + pd.Series(rng.integers(0, 20_000, n)).astype(str),
+        'start': _dcss_time(start),
+        'end': _dcss_time(end), 'v': v,
+        'race': _pick(rng, RACES, n), 'cls': _pick(rng, CLASSES, n), 'god': _pick(rng, GODS, n),
+        'killer': killer, 'ktyp': ktyp, 'tmsg': tmsg, 'place': place, 'lvl': lvl, 'xl': xl, 'tdam': tdam, 'mhp': mhp,
+    }, columns=CSV_COLUMNS)
+
+
+def _to_logfile_lines(df):
+    # key=value 를 ':' 로 잇고 값 안의 ':' 는 '::' (place 는 원래 값 'D:5' 가 이스케이프되어 'D::5')
+    place = df['place'] + ':' + df['lvl'].astype(str)
+    out = None
+    for c in CSV_COLUMNS:
+        col = place if c == 'place' else df[c]
+        field = (c + '=' + col.astype(str).str.replace(':', '::', regex=False)).where(col.notna(), '')
+        out = field if out is None else out + np.where(field == '', '', ':') + field
+    return out.str.lstrip(':') + '\n'
+
+
+def generate_crawllog(n, path, fmt='csv', seed=0):
+    rng = np.random.default_rng(seed)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8', newline='') as f:
+        for offset in range(0, n, GEN_CHUNK_ROWS):
+            chunk = synth_chunk(rng, min(GEN_CHUNK_ROWS, n - offset))
+            if fmt == 'csv':
+                chunk.to_csv(f, index=False, header=offset == 0)
+            else:
+                f.writelines(_to_logfile_lines(chunk))
+    os.replace(tmp, path)
+
+
+def dataset(data_dir, n, fmt, seed):
+    os.makedirs(data_dir, exist_ok=True)
+    name = f"crawllog-{n}-s{seed}.csv" if fmt == 'csv' else f"logfile-{n}-s{seed}"
+    path = os.path.join(data_dir, name)
+    if not os.path.exists(path):
+        t = time.perf_counter()
+        generate_crawllog(n, path, fmt, seed)
+        print(f"  생성 {path} ({time.perf_counter() - t:.1f}s)", file=sys.stderr)
+    return path
+
+
+def _drop_cache(path):
+    for p in app._cache_paths(path):
+        if os.path.exists(p):
+            os.remove(p)
+
+
+def pipeline_steps(path):
+    # (이름, 준비, 실행). 준비는 시간에 넣지 않는다. 실행 결과는 ctx 에 남겨 다음 단계가 쓴다.
+    ctx = {}
+    last30 = lambda idx: (int((idx['span'][1] - pd.Timedelta(days=30)).timestamp()), None)
+    return ctx, [
+        ('load_cold', lambda: _drop_cache(path), lambda: ctx.update(state=app.open_crawllog([path]))),
+        ('load_warm', None, lambda: ctx.update(state=app.open_crawllog([path]))),
+        ('partials', None, lambda: ctx.update(parts=app.build_partials(ctx['state']['df']))),
+        ('ch1', None, lambda: [app.ratio_top(v, c) for v, c in zip(
+            map(app.preference_views(ctx['parts']['games']).get, ['race_grouped', 'cls', 'god']), ['Race', 'Class', 'God'])]),
+        ('ch2', None, lambda: app.ratio_top(app.death_views(ctx['parts']['deaths'])['killer'], 'Killer')),
+        ('ch3', None, lambda: [app.win_stats(app.win_views(ctx['parts']['games']), c) for c in app.WIN_DIMS]),
+        ('summarize', None, lambda: ctx.update(views=app.summarize(ctx['parts']))),
+        ('time_index', None, lambda: ctx.update(index=app.build_time_index(ctx['state']['df']))),
+        ('filter_last30', None, lambda: app.summarize(app.build_partials(
+            ctx['state']['df'].iloc[app.query_rows(ctx['index'], None, *last30(ctx['index']))]))),
+        ('snapshot', None, lambda: app.write_snapshot(app.build_snapshot(ctx['state']), ctx['snapshot_path'])),
+        ('stream', None, lambda: app.stream_snapshot([path])),
+    ]
+
+
+def _rss_mb():
+    # ru_maxrss: 리눅스는 KB, macOS 는 바이트
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_size(path, memory=True, repeat=1):
+    ctx, steps = pipeline_steps(path)
+    ctx['snapshot_path'] = os.path.join(tempfile.gettempdir(), f"bench-snapshot-{os.getpid()}.pkl")
+    results = {}
+    for name, prepare, step in steps:
+        times = []
+        for _ in range(repeat):
+            if prepare: prepare()
+            t = time.perf_counter()
+            step()
+            times.append(time.perf_counter() - t)
+        entry = {'seconds': min(times), 'rss_peak_mb': round(_rss_mb(), 1)}
+        if memory:
+            if prepare: prepare()
+            tracemalloc.start()
+            step()
+            entry['alloc_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / (1 << 20), 1)
+            tracemalloc.stop()
+        results[name] = entry
+        print(f"  {name:<14} {entry['seconds']:8.3f}s" + (f" {entry['alloc_peak_mb']:9.1f} MB" if memory else ""), file=sys.stderr)
+
+    report = ctx['state']['report']
+    if os.path.exists(ctx['snapshot_path']):
+        results['snapshot']['bytes'] = os.path.getsize(ctx['snapshot_path'])
+        os.remove(ctx['snapshot_path'])
+    return {'rows': report['rows'], 'bad_rows': report['bad_rows'], 'file_bytes': os.path.getsize(path),
+            'bytes_per_row': round(float(report['bytes_per_row']), 2), 'partial_rows': {name: len(p) for name, p in ctx['parts'].items()}, 'steps': results}
+
+
+# --check: 같은 게임들을 다른 경로로 읽어도 뷰가 전체 로드와 같아야 한다 (derive_columns/summarize 를 고칠 때 깨지기 쉽다)
+REPORT_KEYS = ['rows', 'bad_rows', 'duplicates']
+
+
+def diff_views(a, b, where=''):
+    # 서로 다른 곳의 경로 목록 (빈 리스트 = 같음). 정수 폭(Int8/Int16 등)은 따지지 않는다.
+    if isinstance(a, dict) and isinstance(b, dict):
+        if list(a) != list(b):
+            return [f"{where}: {list(a)} != {list(b)}"]
+        return [d for k in a for d in diff_views(a[k], b[k], f"{where}[{k!r}]")]
+    try:
+        if isinstance(a, pd.DataFrame):
+            pd.testing.assert_frame_equal(a, b, check_dtype=False, check_index_type=False)
+        elif isinstance(a, pd.Series):
+            pd.testing.assert_series_equal(a, b, check_dtype=False, check_index_type=False)
+        elif a != b:
+            return [where]
+    except (AssertionError, TypeError, ValueError):
+        return [where]
+    return []
+
+
+def _loaded(state):
+    return {'views': state['views'], 'report': {k: state['report'][k] for k in REPORT_KEYS}}
+
+
+def parity_checks(path, other_path, work_dir):
+    # 검사 이름 -> 전체 로드(path)와 다른 곳 목록. other_path 는 같은 시드의 다른 형식(CSV <-> logfile) 파일.
+    _drop_cache(path)
+    base = _loaded(app.open_crawllog([path]))
+    size = os.path.getsize(path)
+    checks = {}
+
+    # 스트리밍: 청크가 여러 개 생기도록 잘게 자른다
+    chunk_bytes = app.LOGFILE_CHUNK_BYTES
+    app.LOGFILE_CHUNK_BYTES = max(size // 7, 1 << 16)
+    try:
+        checks['stream'] = diff_views(base, _loaded(app.stream_snapshot([path], max(base['report']['rows'] // 7, 1000))))
+    finally:
+        app.LOGFILE_CHUNK_BYTES = chunk_bytes
+
+    checks['csv_vs_logfile'] = diff_views(base['views'], app.open_crawllog([other_path])['views'])
+
+    # 이어 읽기: 앞 절반만 읽은 뒤 나머지를 붙이고 refresh
+    grow = os.path.join(work_dir, 'parity-' + os.path.basename(path))
+    _drop_cache(grow)
+    half = app._complete_end(path, size // 2)
+    with open(path, 'rb') as src, open(grow, 'wb') as dst:
+        dst.write(src.read(half))
+    state = app.open_crawllog([grow])
+    with open(path, 'rb') as src, open(grow, 'ab') as dst:
+        src.seek(half)
+        while block := src.read(GEN_CHUNK_ROWS * 64):
+            dst.write(block)
+    app.refresh_crawllog(state)
+    checks['incremental'] = diff_views(base, _loaded(state))
+    _drop_cache(grow)
+    os.remove(grow)
+    return checks
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {'commit': commit, 'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+            'platform': platform.platform(), 'cpus': os.cpu_count(), 'cache_version': app.CACHE_VERSION,
+            'pyarrow': app.feather is not None, 'created': pd.Timestamp.now().isoformat(timespec='seconds')}
+
+
+def compare(current, baseline_path, threshold=1.2, min_delta=0.05):
+    # 같은 크기/단계끼리 시간 비율. threshold 배 이상, min_delta 초 이상 느려진 단계는 '!' 로 표시한다 (ms 단위 단계의 잡음 제외).
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    print(f"\n기준: {baseline_path} ({baseline['env'].get('commit')}) -> 현재 ({current['env'].get('commit')})")
+    slower = 0
+    for size, res in current['results'].items():
+        base = baseline['results'].get(size)
+        if not base:
+            continue
+        for step, entry in res['steps'].items():
+            if step not in base['steps']:
+                continue
+            ratio = entry['seconds'] / max(base['steps'][step]['seconds'], 1e-9)
+            flag = '!' if ratio >= threshold and entry['seconds'] - base['steps'][step]['seconds'] >= min_delta else ' '
+            slower += flag == '!'
+            print(f"{flag} {size:>6} {step:<14} {base['steps'][step]['seconds']:8.3f}s -> {entry['seconds']:8.3f}s  x{ratio:.2f}")
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="합성 crawllog 로 app.py 데이터 파이프라인의 시간/메모리를 잰다")
+    parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES, help="행 수 (10k, 1m, 2500 ...)")
+    parser.add_argument('--format', choices=['csv', 'logfile'], default='csv')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default='.bench', help="합성 로그를 만들어 두는 곳 (있으면 다시 쓴다)")
+    parser.add_argument('--repeat', type=int, default=1, help="단계마다 몇 번 재서 최솟값을 쓸지")
+    parser.add_argument('--no-memory', action='store_true', help="tracemalloc 측정 생략")
+    parser.add_argument('--out', default='bench_results.json')
+    parser.add_argument('--compare', metavar='BASELINE', help="이전 결과 JSON 과 단계별 시간 비교")
+    parser.add_argument('--check', action='store_true',
+                        help="시간 대신 스트리밍 / CSV-logfile / 이어 읽기가 전체 로드와 같은 뷰를 내는지 검사 (다르면 종료 코드 1)")
+    args = parser.parse_args(argv)
+
+    # 디스크 캐시는 벤치 데이터 옆에 둔다 (작업 디렉터리의 .crawl_cache 를 건드리지 않도록)
+    app.CACHE_DIR = os.path.join(args.data_dir, 'cache')
+    if args.check:
+        failed = 0
+        other = 'logfile' if args.format == 'csv' else 'csv'
+        for size in args.sizes:
+            n = parse_size(size)
+            print(f"[{size}] {n:,}행 {args.format} 일치 검사", file=sys.stderr)
+            path = dataset(args.data_dir, n, args.format, args.seed)
+            checks = parity_checks(path, dataset(args.data_dir, n, other, args.seed), args.data_dir)
+            for name, diffs in checks.items():
+                failed += bool(diffs)
+                print(f"  {name:<14} " + ("ok" if not diffs else "다름: " + ", ".join(diffs[:5])), file=sys.stderr)
+        return 1 if failed else 0
+
+    out = {'env': environment() | {'format': args.format, 'seed': args.seed}, 'results': {}}
+    for size in args.sizes:
+        n = parse_size(size)
+        print(f"[{size}] {n:,}행 {args.format}", file=sys.stderr)
+        path = dataset(args.data_dir, n, args.format, args.seed)
+        out['results'][size] = run_size(path, memory=not args.no_memory, repeat=args.repeat)
+
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(out, f, indent=2, ensure_ascii=False)
+    print(f"-> {args.out}", file=sys.stderr)
+    if args.compare:
+        return 1 if compare(out, args.compare) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())